@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+from .db import apply_pragmas
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        connection_created.connect(apply_pragmas)
+        if settings.WARM_UP:
+            from .warmup import warm_up
+            warm_up()
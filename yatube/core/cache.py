@@ -0,0 +1,484 @@
+import math
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache as default_cache
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Насколько устаревшее время обращения обновляем при чтении, сек.
+# Точность LRU в обмен на то, что чтение почти никогда не пишет.
+ACCESS_RESOLUTION = 60
+# SQLite ограничивает число параметров в одном запросе.
+MAX_VARIABLES = 900
+# Сколько последних событий инвалидации хранится для TieredCache.
+EVENTS_KEPT = 10000
+# Событие, сбрасывающее L1 целиком.
+CLEAR_ALL = '*'
+
+# Параметры get_or_compute: сколько держится блокировка пересчета,
+# сколько ждать чужого пересчета при пустом кеше и как рано (XFetch)
+# начинать пересчет до истечения ключа.
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 5
+LOCK_POLL = 0.05
+XFETCH_BETA = 1.0
+
+# Соединения, унаследованные после fork. Закрывать их в дочернем
+# процессе нельзя: SQLite не переносит соединения через fork.
+_inherited = []
+
+
+class SQLiteCache(BaseCache):
+    """
+    Кеш в файле SQLite в режиме WAL, общий для всех процессов сервера.
+
+    Записи атомарны, у каждой есть срок жизни. При переполнении
+    сначала удаляются просроченные записи, затем давно не читанные.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            if getattr(local, 'connection', None) is not None:
+                _inherited.append(local.connection)
+            local.connection = self._connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    def _connect(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # В кеше бывают данные пользователей: файл читает только владелец,
+        # -wal и -shm SQLite создает с теми же правами.
+        os.close(os.open(self._path, os.O_CREAT | os.O_WRONLY, 0o600))
+        connection = sqlite3.connect(
+            self._path, timeout=5, isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+            'expires REAL, accessed REAL NOT NULL)'
+        )
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache_events ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'key TEXT NOT NULL, origin INTEGER NOT NULL)'
+        )
+        return connection
+
+    def _write(self):
+        """Транзакция, сразу берущая блокировку на запись."""
+        return _Transaction(self._connection())
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._get_many([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = self._get_many(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def _get_many(self, keys):
+        now = time.time()
+        found = {}
+        stale = []
+        connection = self._connection()
+        for start in range(0, len(keys), MAX_VARIABLES):
+            chunk = keys[start:start + MAX_VARIABLES]
+            rows = connection.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(chunk))})',
+                chunk,
+            )
+            for key, value, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    continue
+                found[key] = pickle.loads(value)
+                if accessed < now - ACCESS_RESOLUTION:
+                    stale.append(key)
+        if stale:
+            connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?',
+                [(now, key) for key in stale],
+            )
+        return found
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        expires = self._expires(timeout)
+        rows = [
+            (self._key(key, version), _dumps(value), expires, now)
+            for key, value in data.items()
+        ]
+        with self._write() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                rows,
+            )
+            self._cull(connection, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            inserted = connection.execute(
+                'INSERT INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+                'value = excluded.value, expires = excluded.expires, '
+                'accessed = excluded.accessed '
+                'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+                (key, _dumps(value), self._expires(timeout), now, now),
+            ).rowcount
+            self._cull(connection, now)
+        return bool(inserted)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            touched = connection.execute(
+                'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self._expires(timeout), now, key, now),
+            ).rowcount
+        return bool(touched)
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно: чтение и запись в одной транзакции на запись."""
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, now),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (_dumps(value), now, key),
+            )
+        return value
+
+    def delete(self, key, version=None):
+        return bool(self._delete_many([self._key(key, version)]))
+
+    def delete_many(self, keys, version=None):
+        self._delete_many([self._key(key, version) for key in keys])
+
+    def _delete_many(self, keys):
+        deleted = 0
+        with self._write() as connection:
+            for start in range(0, len(keys), MAX_VARIABLES):
+                chunk = keys[start:start + MAX_VARIABLES]
+                deleted += connection.execute(
+                    'DELETE FROM cache '
+                    f'WHERE key IN ({", ".join("?" * len(chunk))})',
+                    chunk,
+                ).rowcount
+        return deleted
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+
+    def publish(self, keys, origin):
+        """Записывает события инвалидации ключей L1 для TieredCache."""
+        with self._write() as connection:
+            connection.executemany(
+                'INSERT INTO cache_events (key, origin) VALUES (?, ?)',
+                [(key, origin) for key in keys],
+            )
+            connection.execute(
+                'DELETE FROM cache_events WHERE id <= '
+                '(SELECT MAX(id) FROM cache_events) - ?',
+                (EVENTS_KEPT,),
+            )
+
+    def events(self, after, origin):
+        """
+        Ключи, измененные другими процессами после события after.
+
+        Возвращает номер последнего события и ключи. Если события
+        после after уже удалены, вместо ключей приходит CLEAR_ALL.
+        """
+        connection = self._connection()
+        first, last = connection.execute(
+            'SELECT MIN(id), MAX(id) FROM cache_events').fetchone()
+        if last is None or after is None or after >= last:
+            return last or 0, []
+        if after < first - 1:
+            return last, [CLEAR_ALL]
+        keys = [
+            key for key, in connection.execute(
+                'SELECT key FROM cache_events '
+                'WHERE id > ? AND id <= ? AND origin != ?',
+                (after, last, origin),
+            )
+        ]
+        return last, keys
+
+    def _cull(self, connection, now):
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count <= self._max_entries:
+            return
+        if not self._cull_frequency:
+            connection.execute('DELETE FROM cache')
+            return
+        count -= connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (now,)).rowcount
+        if count > self._max_entries:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY accessed LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
+
+
+class TieredCache(BaseCache):
+    """
+    Маленький LRU-кеш процесса (L1) перед общим кешем (L2).
+
+    LOCATION - алиас общего кеша SQLiteCache. Изменения через этот кеш
+    пишутся в L2 и публикуются в его таблицу событий. Каждый процесс
+    читает события не чаще раза в POLL_INTERVAL секунд и выбрасывает
+    измененные ключи из L1, так что чужая запись видна не позже чем
+    через интервал. Записи L1 живут не дольше L1_TIMEOUT, чтобы
+    не пережить истечение ключа в L2. MAX_ENTRIES - размер L1.
+    Как и в LocMemCache, L1 хранит pickle и каждый get получает свою
+    копию значения.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared = location
+        self._poll_interval = options.get('POLL_INTERVAL', 1)
+        self._l1_timeout = options.get('L1_TIMEOUT', 5)
+        self._l1 = OrderedDict()
+        self._lock = threading.RLock()
+        self._last_event = None
+        self._polled = 0
+
+    @property
+    def l2(self):
+        return caches[self._shared]
+
+    def _key(self, key, version):
+        """Ключ с версией, в L2 он передается уже готовым."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _poll(self):
+        now = time.monotonic()
+        if now - self._polled < self._poll_interval:
+            return
+        with self._lock:
+            self._polled = now
+            self._last_event, keys = self.l2.events(
+                self._last_event, os.getpid())
+            if CLEAR_ALL in keys:
+                self._l1.clear()
+            for key in keys:
+                self._l1.pop(key, None)
+
+    def _remember(self, key, value, timeout=DEFAULT_TIMEOUT):
+        ttl = self._l1_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            ttl = min(ttl, timeout)
+        with self._lock:
+            self._l1[key] = (_dumps(value), time.monotonic() + ttl)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._max_entries:
+                self._l1.popitem(last=False)
+
+    def _recall(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return False, None
+            if entry[1] <= time.monotonic():
+                del self._l1[key]
+                return False, None
+            self._l1.move_to_end(key)
+        return True, pickle.loads(entry[0])
+
+    def _forget(self, keys):
+        with self._lock:
+            for key in keys:
+                self._l1.pop(key, None)
+        self.l2.publish(keys, os.getpid())
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        self._poll()
+        found = {}
+        missing = {}
+        for key in keys:
+            made_key = self._key(key, version)
+            hit, value = self._recall(made_key)
+            if hit:
+                found[key] = value
+            else:
+                missing[made_key] = key
+        if missing:
+            shared = self.l2.get_many(list(missing))
+            for made_key, value in shared.items():
+                self._remember(made_key, value)
+                found[missing[made_key]] = value
+        return found
+
+    def has_key(self, key, version=None):
+        self._poll()
+        made_key = self._key(key, version)
+        return self._recall(made_key)[0] or made_key in self.l2
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        data = {self._key(key, version): value for key, value in data.items()}
+        self.l2.set_many(data, timeout)
+        self._forget(list(data))
+        for key, value in data.items():
+            self._remember(key, value, timeout)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made_key = self._key(key, version)
+        if not self.l2.add(made_key, value, timeout):
+            return False
+        self._forget([made_key])
+        self._remember(made_key, value, timeout)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        made_key = self._key(key, version)
+        value = self.l2.incr(made_key, delta)
+        self._forget([made_key])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(self._key(key, version), timeout)
+
+    def delete(self, key, version=None):
+        made_key = self._key(key, version)
+        deleted = self.l2.delete(made_key)
+        self._forget([made_key])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self.l2.delete_many(keys)
+            self._forget(keys)
+
+    def clear(self):
+        self.l2.clear()
+        self._forget([CLEAR_ALL])
+        with self._lock:
+            self._l1.clear()
+
+
+def get_or_compute(key, compute, timeout, beta=XFETCH_BETA, cache=None):
+    """
+    Значение из кеша без лавины пересчетов при истечении ключа.
+
+    В кеше лежит значение, время его вычисления и срок. Незадолго до
+    срока ключ пересчитывается с растущей вероятностью (XFetch), после
+    срока значение еще столько же отдается устаревшим. Пересчитывает
+    только взявший блокировку через cache.add, остальные получают
+    текущее значение, а при пустом кеше ждут пересчета.
+    """
+    cache = cache or default_cache
+    lock_key = f'{key}:lock'
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires = entry
+        early = delta * beta * math.log(random.random() or 1e-12)
+        if time.time() - early < expires:
+            return value
+        if not cache.add(lock_key, True, LOCK_TIMEOUT):
+            return value
+        return _compute(key, lock_key, compute, timeout, cache)
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(lock_key, True, LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            return compute()
+        time.sleep(LOCK_POLL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return _compute(key, lock_key, compute, timeout, cache)
+
+
+def _compute(key, lock_key, compute, timeout, cache):
+    try:
+        started = time.time()
+        value = compute()
+        delta = time.time() - started
+        cache.set(key, (value, delta, time.time() + timeout), timeout * 2)
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+class _Transaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+def _dumps(value):
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,40 @@
+from django.conf import settings
+
+# Так SQLite возвращает synchronous в PRAGMA без значения.
+SYNCHRONOUS = {'OFF': 0, 'NORMAL': 1, 'FULL': 2, 'EXTRA': 3}
+
+
+def apply_pragmas(sender=None, connection=None, **kwargs):
+    """
+    Обработчик connection_created: PRAGMA из SQLITE_PRAGMAS.
+
+    journal_mode хранится в файле базы, остальные действуют только
+    на это соединение, поэтому ставятся при каждом подключении.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def check_pragmas(connection):
+    """Расхождения PRAGMA соединения с SQLITE_PRAGMAS: имя -> (ждали, есть)."""
+    if connection.vendor != 'sqlite':
+        return {}
+    mismatches = {}
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}')
+            actual = cursor.fetchone()[0]
+            expected = normalize(name, value)
+            if normalize(name, actual) != expected:
+                mismatches[name] = (expected, actual)
+    return mismatches
+
+
+def normalize(name, value):
+    value = str(value).upper()
+    if name == 'synchronous':
+        value = str(SYNCHRONOUS.get(value, value))
+    return value
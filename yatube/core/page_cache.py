@@ -0,0 +1,72 @@
+import base64
+import hashlib
+import json
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+HOLE = re.compile(r'<!--hole:([A-Za-z0-9_=-]+)-->')
+
+
+def cache_page_with_holes(timeout, version=None):
+    """
+    Кеширует GET-страницу целиком, общую для всех посетителей.
+
+    Пользовательские куски страницы ({% hole %}) при заполнении кеша
+    остаются метками и дорисовываются для каждого запроса уже после
+    чтения кеша. version() входит в ключ и сбрасывает все страницы.
+    Включается настройкой FULL_PAGE_CACHE.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not settings.FULL_PAGE_CACHE or request.method != 'GET':
+                return view(request, *args, **kwargs)
+            key = page_key(request, version() if version else '')
+            body = cache.get(key)
+            if body is not None:
+                return HttpResponse(fill_holes(body, request))
+            request.punch_holes = True
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                request.punch_holes = False
+            if response.streaming or not hasattr(response, 'content'):
+                return response
+            body = response.content.decode(response.charset)
+            if response.status_code == 200:
+                cache.set(key, body, timeout)
+            response.content = fill_holes(body, request)
+            return response
+        return wrapper
+    return decorator
+
+
+def page_key(request, version):
+    query = sorted(request.GET.lists())
+    path = f'{request.path}?{json.dumps(query)}'
+    digest = hashlib.md5(path.encode()).hexdigest()
+    return f'page:{version}:{digest}'
+
+
+def hole_marker(template_name, params):
+    data = json.dumps([template_name, params]).encode()
+    return f'<!--hole:{base64.urlsafe_b64encode(data).decode()}-->'
+
+
+def fill_holes(body, request):
+    """
+    Дорисовывает метки {% hole %} для текущего запроса.
+
+    Метки не подделать текстом поста: автоэкранирование превращает
+    '<' в '&lt;'.
+    """
+    def render(match):
+        template_name, params = json.loads(
+            base64.urlsafe_b64decode(match.group(1)))
+        return render_to_string(template_name, params, request=request)
+    return HOLE.sub(render, body)
@@ -0,0 +1,23 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.page_cache import hole_marker
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name, **params):
+    """
+    Пользовательский кусок страницы, который не попадает в общий кеш.
+
+    {% hole 'includes/header_user.html' key=value %} - шаблон получает
+    params (только строки, числа и bool), пользователя, request и CSRF.
+    Без кеширования рисуется сразу в текущем контексте.
+    """
+    request = context.get('request')
+    if getattr(request, 'punch_holes', False):
+        return mark_safe(hole_marker(template_name, params))
+    with context.push(**params):
+        return context.template.engine.get_template(
+            template_name).render(context)
@@ -1,4 +1,25 @@
-from django.test import TestCase
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.template import engines
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .cache import EVENTS_KEPT, SQLiteCache, get_or_compute
+from .warmup import compile_templates
+
+with mock.patch.dict(os.environ, {'YATUBE_SECRET_KEY': 'test'}):
+    from yatube.settings_prod import TEMPLATES as PROD_TEMPLATES
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +27,306 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+def worker(location, ready, done):
+    """Второй процесс сервера: читает чужую запись и удаляет ее."""
+    cache = SQLiteCache(location, {})
+    ready.put(cache.get('shared'))
+    cache.delete('shared')
+    cache.set('from_worker', os.getpid())
+    cache.incr('counter', 10)
+    done.put(True)
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def run_in_process(self, target, *args):
+        context = multiprocessing.get_context('fork')
+        process = context.Process(target=target, args=args)
+        process.start()
+        process.join(10)
+        self.assertEqual(process.exitcode, 0)
+
+    def test_file_readable_by_owner_only(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(os.stat(self.location).st_mode & 0o777, 0o600)
+
+    def test_tests_do_not_share_dev_cache(self):
+        self.assertNotEqual(
+            os.path.dirname(settings.CACHES['shared']['LOCATION']),
+            settings.BASE_DIR,
+        )
+
+    def test_invalidation_between_processes(self):
+        """Запись и удаление видны всем процессам."""
+        context = multiprocessing.get_context('fork')
+        ready, done = context.Queue(), context.Queue()
+        self.cache.set('shared', {'value': 1})
+        self.cache.set('counter', 1)
+        self.run_in_process(worker, self.location, ready, done)
+        self.assertEqual(ready.get(timeout=5), {'value': 1})
+        self.assertTrue(done.get(timeout=5))
+        self.assertIsNone(self.cache.get('shared'))
+        self.assertNotEqual(self.cache.get('from_worker'), os.getpid())
+        self.assertEqual(self.cache.get('counter'), 11)
+
+    def test_inherited_connection_after_fork(self):
+        """После fork кеш открывает свое соединение и продолжает работать."""
+        self.cache.set('before_fork', 1)
+
+        def child():
+            self.cache.set('after_fork', self.cache.get('before_fork') + 1)
+
+        self.run_in_process(child)
+        self.assertEqual(self.cache.get('after_fork'), 2)
+
+    def test_concurrent_incr_is_atomic(self):
+        self.cache.set('hits', 0)
+
+        def child():
+            for _ in range(50):
+                self.cache.incr('hits')
+
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=child) for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(10)
+        self.assertEqual(self.cache.get('hits'), 200)
+
+    def test_timeout(self):
+        self.cache.set('short', 1, timeout=0.05)
+        self.cache.set('forever', 1, timeout=None)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertNotIn('short', self.cache)
+        self.assertTrue(self.cache.add('short', 2))
+        self.assertFalse(self.cache.add('short', 3))
+        self.assertEqual(self.cache.get('short'), 2)
+        self.assertEqual(self.cache.get('forever'), 1)
+
+    def test_lru_eviction(self):
+        cache = SQLiteCache(
+            self.location, {'OPTIONS': {'MAX_ENTRIES': 4}})
+        for num in range(4):
+            cache.set(num, num)
+            cache._connection().execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?',
+                (num, cache.make_key(num)))
+        cache._connection().execute(
+            'UPDATE cache SET accessed = 10 WHERE key = ?',
+            (cache.make_key(0),))
+        cache.set('new', 1)
+        self.assertEqual(
+            cache.get_many([0, 1, 2, 3, 'new']),
+            {0: 0, 2: 2, 3: 3, 'new': 1},
+        )
+
+    def test_many_and_touch(self):
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+        self.assertTrue(self.cache.touch('a', timeout=None))
+        self.assertFalse(self.cache.touch('c'))
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+
+
+def tiered_worker(key, value):
+    """Другой процесс меняет ключ через свой TieredCache."""
+    caches['tiered'].set(key, value)
+
+
+class TieredCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings = override_settings(CACHES={
+            'tiered': {
+                'BACKEND': 'core.cache.TieredCache',
+                'LOCATION': 'l2',
+                'OPTIONS': {'MAX_ENTRIES': 2, 'POLL_INTERVAL': 0},
+            },
+            'l2': {
+                'BACKEND': 'core.cache.SQLiteCache',
+                'LOCATION': os.path.join(self.directory, 'cache.sqlite3'),
+            },
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.cache = caches['tiered']
+        self.l2 = caches['l2']
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_l1_hit_skips_l2(self):
+        self.cache.set('key', 1)
+        with mock.patch.object(self.l2, 'get_many') as get_many:
+            self.assertEqual(self.cache.get('key'), 1)
+        get_many.assert_not_called()
+
+    def test_invalidation_from_other_process(self):
+        """Запись другого процесса выбрасывает ключ из L1 этого."""
+        self.cache.set('key', 1)
+        self.assertEqual(self.cache.get('key'), 1)
+        process = multiprocessing.get_context('fork').Process(
+            target=tiered_worker, args=('key', 2))
+        process.start()
+        process.join(10)
+        self.assertEqual(self.cache.get('key'), 2)
+
+    def test_poll_interval_bounds_staleness(self):
+        self.cache._poll_interval = 60
+        self.cache.get('key')
+        self.cache.set('key', 1)
+        self.l2.publish([self.cache.make_key('key')], origin=0)
+        self.assertEqual(self.cache.get('key'), 1)
+        self.cache._polled = 0
+        self.l2.set(self.cache.make_key('key'), 2)
+        self.assertEqual(self.cache.get('key'), 2)
+
+    def test_lost_events_clear_l1(self):
+        self.cache.set('key', 1)
+        self.cache.get('other')
+        self.l2.set(self.cache.make_key('key'), 2)
+        self.l2.publish(['noise'] * (EVENTS_KEPT + 2), origin=0)
+        self.assertEqual(self.cache.get('key'), 2)
+
+    def test_l1_returns_copies(self):
+        """Изменение полученного значения не меняет его в L1."""
+        value = {'items': [1]}
+        self.cache.set('key', value)
+        value['items'].append(2)
+        self.cache.get('key')['items'].append(3)
+        self.assertEqual(self.cache.get('key'), {'items': [1]})
+
+    def test_l1_is_bounded(self):
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(list(self.cache._l1), [
+            self.cache.make_key('b'), self.cache.make_key('c')])
+        self.assertEqual(self.cache.get('a'), 1)
+
+    def test_delete_and_clear(self):
+        self.cache.set('key', 1)
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set('key', 1)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 3))
+        self.assertEqual(self.cache.incr('key'), 4)
+        self.assertEqual(self.cache.get('key'), 4)
+
+
+class GetOrComputeTest(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocMemCache(self.id(), {})
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        time.sleep(0.05)
+        return self.calls
+
+    def get(self, timeout=20):
+        return get_or_compute('feed', self.compute, timeout, cache=self.cache)
+
+    def test_single_flight_on_empty_cache(self):
+        """Одновременные запросы к пустому ключу считают его один раз."""
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.get()))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [1] * 8)
+
+    def test_stale_served_while_rebuilding(self):
+        self.cache.set('feed', ('stale', 0.01, time.time() - 1), 60)
+        self.cache.add('feed:lock', True)
+        self.assertEqual(self.get(), 'stale')
+        self.assertEqual(self.calls, 0)
+
+    def test_expired_key_rebuilt_once(self):
+        self.cache.set('feed', ('stale', 0.01, time.time() - 1), 60)
+        self.assertEqual(self.get(), 1)
+        self.assertEqual(self.get(), 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_early_recompute_before_expiry(self):
+        """Дорогой ключ пересчитывается заранее, до истечения."""
+        self.cache.set('feed', ('old', 1000, time.time() + 1), 60)
+        with mock.patch('core.cache.random.random', return_value=0.5):
+            self.assertEqual(self.get(), 1)
+
+    def test_fresh_key_not_recomputed(self):
+        self.cache.set('feed', ('fresh', 0.001, time.time() + 10), 60)
+        self.assertEqual(self.get(), 'fresh')
+        self.assertEqual(self.calls, 0)
+
+
+class WarmUpTest(SimpleTestCase):
+    def test_compiles_project_templates(self):
+        """Шаблоны из templates/ попадают в кеширующий загрузчик."""
+        with override_settings(TEMPLATES=PROD_TEMPLATES):
+            count = compile_templates()
+            loader = engines['django'].engine.template_loaders[0]
+            self.assertIn('posts/index.html', loader.get_template_cache)
+            self.assertIn(
+                'posts/includes/card_post.html', loader.get_template_cache)
+        self.assertGreater(count, 10)
+
+    def test_broken_template_is_logged(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(os.path.join(directory, 'broken.html'), 'w') as file:
+            file.write('{% if %}')
+        templates = [{**PROD_TEMPLATES[0], 'DIRS': [directory]}]
+        with override_settings(TEMPLATES=templates):
+            with self.assertLogs('core.warmup', 'ERROR'):
+                self.assertEqual(compile_templates(), 0)
+
+    @override_settings(WARM_UP=True)
+    def test_ready_warms_up(self):
+        with mock.patch('core.warmup.warm_up') as warm_up:
+            apps.get_app_config('core').ready()
+        warm_up.assert_called_once_with()
+
+
+class HealthTest(TestCase):
+    def setUp(self):
+        self.addCleanup(self.reset_cache_size)
+
+    def reset_cache_size(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size = -2000')
+
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -1024})
+    def test_new_connection_gets_pragmas(self):
+        connection_created.send(
+            sender=connection.__class__, connection=connection)
+        response = self.client.get('/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'ok')
+
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -1024})
+    def test_reports_mismatch(self):
+        response = self.client.get('/health/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(
+            response.json()['mismatches'],
+            {'cache_size': {'expected': '-1024', 'actual': -2000}},
+        )
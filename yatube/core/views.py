@@ -1,4 +1,9 @@
+from django.db import DatabaseError, connection
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.views.decorators.cache import never_cache
+
+from .db import check_pragmas
 
 
 def page_not_found(request, exception):
@@ -15,3 +20,24 @@ def csrf_failure(request, reason=''):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+@never_cache
+def health(request):
+    """Проверка для балансировщика: база отвечает, PRAGMA на месте."""
+    try:
+        mismatches = check_pragmas(connection)
+    except DatabaseError as error:
+        return JsonResponse(
+            {'status': 'fail', 'error': str(error)}, status=503)
+    return JsonResponse(
+        {
+            'status': 'fail' if mismatches else 'ok',
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'mismatches': {
+                name: {'expected': expected, 'actual': actual}
+                for name, (expected, actual) in mismatches.items()
+            },
+        },
+        status=503 if mismatches else 200,
+    )
@@ -0,0 +1,61 @@
+import logging
+import os
+
+from django.template import TemplateSyntaxError, engines
+from django.urls import reverse
+from django.utils.functional import empty
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    """
+    Готовит процесс к первому запросу: шаблоны, URL и картинки.
+
+    Вызывается из CoreConfig.ready() при WARM_UP = True, до того как
+    сервер начнет принимать запросы.
+    """
+    compile_templates()
+    # Импортирует все urls.py с представлениями и строит индекс reverse().
+    reverse('posts:index')
+    warm_images()
+
+
+def template_names(directory):
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(('.html', '.txt')):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, directory).replace(os.sep, '/')
+
+
+def compile_templates():
+    """
+    Компилирует шаблоны из каталогов TEMPLATES['DIRS'].
+
+    С кеширующим загрузчиком они остаются в памяти процесса, а заодно
+    импортируются все библиотеки тегов. Сломанный шаблон не мешает
+    запуску: ошибка в лог, страница с ним упадет как и раньше.
+    """
+    count = 0
+    for engine in engines.all():
+        for directory in getattr(engine, 'engine', engine).dirs:
+            for name in template_names(directory):
+                try:
+                    engine.get_template(name)
+                except TemplateSyntaxError:
+                    logger.exception('Не удалось собрать шаблон %s', name)
+                else:
+                    count += 1
+    return count
+
+
+def warm_images():
+    """Импортирует Pillow с его плагинами и бэкенд sorl заранее."""
+    from PIL import Image
+    from sorl.thumbnail import default
+
+    Image.init()
+    for lazy in (default.backend, default.kvstore, default.engine):
+        if lazy._wrapped is empty:
+            lazy._setup()
@@ -0,0 +1,42 @@
+from functools import wraps
+
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .utils import page_version, pages_modified
+
+
+def page_etag(request, *args, **kwargs):
+    """
+    ETag страницы без рендера и без запросов к базе.
+
+    Версия страниц меняется при любом изменении постов, групп,
+    комментариев и подписок, пользователь входит в ETag, потому что
+    меню и кнопки у всех свои.
+    """
+    user = request.user
+    return f'{page_version()}-{user.pk if user.is_authenticated else 0}'
+
+
+def page_last_modified(request, *args, **kwargs):
+    return pages_modified()
+
+
+def conditional_page(view):
+    """
+    Отвечает 304 без вызова представления, если страница не менялась.
+
+    Cache-Control: no-cache заставляет браузер и прокси каждый раз
+    сверять ETag, а не отдавать страницу по эвристике Last-Modified.
+    """
+    conditional = condition(
+        etag_func=page_etag,
+        last_modified_func=page_last_modified,
+    )(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = conditional(request, *args, **kwargs)
+        patch_cache_control(response, no_cache=True)
+        return response
+    return wrapper
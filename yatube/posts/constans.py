@@ -1,2 +1,25 @@
 POST_LIMIT = 10  # колличество постов на странице
 STR_LENG = 15  # длина строки
+COMMENT_LIMIT = 20  # колличество комментариев в одной порции
+FEED_VERSION_KEY = 'feed_version'  # ключ версии ленты в кеше
+FEED_COUNT_TIMEOUT = 300  # время жизни числа постов ленты, сек.
+TIMELINE_ENABLED = True  # материализованная лента подписок
+TIMELINE_FANOUT_LIMIT = 1000  # с этого числа подписчиков лента на чтении
+TIMELINE_BATCH = 1000  # постов в пачке при заполнении ленты подписчика
+TIMELINE_BACKFILL_LIMIT = 500  # больше постов автора - лента на чтении
+HEAVY_AUTHORS_KEY = 'timeline_heavy_authors'  # ключ кеша популярных авторов
+HEAVY_AUTHORS_TIMEOUT = 300  # время жизни списка популярных авторов, сек.
+THUMBNAIL_GEOMETRY = '960x339'  # размер миниатюры картинки поста
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+IMAGE_VARIANT_WIDTHS = (320, 640, 960)  # ширины для srcset картинки поста
+IMAGE_VARIANT_FORMATS = ('avif', 'webp', 'jpeg')  # по убыванию выгоды
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024  # предел размера картинки, байт
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+IMAGE_MAX_PIXELS = 50_000_000  # больше не декодируем даже для уменьшения
+IMAGE_MAX_SIDE = 2560  # оригиналы крупнее уменьшаются при загрузке
+OBJECT_CACHE_TIMEOUT = 300  # время жизни групп и авторов в кеше, сек.
+CARD_CACHE_TIMEOUT = 3600  # время жизни готовой карточки поста, сек.
+PAGE_VERSION_KEY = 'page_version'  # ключ версии страниц в кеше целиком
+PAGE_MODIFIED_KEY = 'page_modified'  # время последнего изменения страниц
+PAGE_CACHE_TIMEOUT = 60  # время жизни страницы в кеше целиком, сек.
@@ -0,0 +1,52 @@
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def shift(queryset, field, delta):
+    """Атомарно сдвигает счетчик field у записей queryset на delta."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def count_of(queryset, field, outer='pk'):
+    """Подзапрос COUNT(*) по queryset для каждой внешней записи."""
+    totals = (
+        queryset.filter(**{field: OuterRef(outer)})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(totals), 0)
+
+
+def recount(apps=global_apps):
+    """Пересчитывает все счетчики массовыми UPDATE.
+
+    Принимает реестр моделей, по умолчанию - текущий.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Profile = apps.get_model('posts', 'Profile')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+
+    Profile.objects.bulk_create(
+        (
+            Profile(user_id=user_id)
+            for user_id in User.objects.filter(
+                profile__isnull=True).values_list('pk', flat=True)
+        ),
+        ignore_conflicts=True,
+    )
+    Profile.objects.update(
+        post_count=count_of(Post.objects, 'author', 'user'),
+        follower_count=count_of(Follow.objects, 'author', 'user'),
+        following_count=count_of(Follow.objects, 'user', 'user'),
+    )
+    Group.objects.update(post_count=count_of(Post.objects, 'group'))
+    Post.objects.update(comment_count=count_of(Comment.objects, 'post'))
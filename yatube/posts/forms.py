@@ -10,12 +10,25 @@ class PostForm(forms.ModelForm):
     text - текст поста
     group - группа поста
     image - картинка.
+
+    upload_errors - отказы ImageUploadHandler, картинка
+    в этом случае до формы не доходит.
     """
 
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, upload_errors=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_errors = upload_errors
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for error in self.upload_errors:
+            self.add_error('image', error)
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     """
@@ -0,0 +1,58 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.constans import POST_LIMIT
+from posts.models import Post
+
+
+def model_page():
+    return list(Post.objects.for_feed()[:POST_LIMIT])
+
+
+def row_page():
+    return list(Post.objects.for_feed().feed_rows()[:POST_LIMIT])
+
+
+def measure(build, repeat):
+    """Время на страницу, память под страницу и пик при ее сборке."""
+    build()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        build()
+    elapsed = (time.perf_counter() - started) / repeat
+    tracemalloc.start()
+    try:
+        page = build()
+        held, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return len(page), elapsed, held, peak
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает первую страницу главной из моделей Post и из легких '
+        'строк feed_rows(): время, память под страницу и пик памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if not Post.objects.exists():
+            raise CommandError('Нет постов для замера.')
+        results = {}
+        for name, build in (('модели', model_page), ('строки', row_page)):
+            size, elapsed, held, peak = measure(build, options['repeat'])
+            results[name] = (elapsed, held)
+            self.stdout.write(
+                f'{name}: {size} постов, {elapsed * 1000:.2f} мс, '
+                f'{held / 1024:.1f} КБ, пик {peak / 1024:.1f} КБ'
+            )
+        (model_time, model_mem), (row_time, row_mem) = results.values()
+        self.stdout.write(self.style.SUCCESS(
+            f'Строки быстрее в {model_time / row_time:.1f} раза, '
+            f'памяти меньше в {model_mem / max(row_mem, 1):.1f} раза.'
+        ))
@@ -0,0 +1,63 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.constans import POST_LIMIT
+from posts.models import Comment, Post
+from posts.paginators import KeysetPaginator
+from posts.timeline import FOLLOW_FEED_KEYS, follow_feed
+
+FULL_SCAN = (
+    re.compile(r'\bSCAN (TABLE )?\w+$'),  # SQLite
+    re.compile(r'\bSeq Scan on\b'),  # PostgreSQL
+)
+
+
+def feed_queries():
+    """Запросы страниц лент в том виде, в каком их строят вьюхи."""
+    feeds = {
+        'index': (Post.objects.for_feed().feed_rows(), ('pub_date', 'id')),
+        'group_posts': (
+            Post.objects.for_feed().filter(group_id=0).feed_rows(),
+            ('pub_date', 'id'),
+        ),
+        'profile': (
+            Post.objects.for_feed().filter(author_id=0).feed_rows(),
+            ('pub_date', 'id'),
+        ),
+        'follow_index': (
+            follow_feed(get_user_model()(pk=0)).feed_rows(),
+            FOLLOW_FEED_KEYS,
+        ),
+    }
+    for name, (queryset, keys) in feeds.items():
+        paginator = KeysetPaginator(queryset, POST_LIMIT, keys=keys)
+        yield name, paginator.object_list[:POST_LIMIT + 1]
+    comments = Comment.objects.filter(post_id=0).order_by('-created', '-id')
+    yield 'comments', comments[:POST_LIMIT + 1]
+
+
+def full_scans(plan):
+    """Строки плана, в которых таблица читается целиком."""
+    return [
+        line for line in plan.splitlines()
+        if any(pattern.search(line.strip()) for pattern in FULL_SCAN)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN для запросов лент, ошибка при полном сканировании.'
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, queryset in feed_queries():
+            plan = queryset.explain()
+            self.stdout.write(f'== {name}\n{plan}\n')
+            if full_scans(plan):
+                failed.append(name)
+        if failed:
+            raise CommandError(
+                'Полное сканирование таблицы в лентах: ' + ', '.join(failed)
+            )
+        self.stdout.write(self.style.SUCCESS('Все ленты идут по индексам.'))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.markup import render_text
+from posts.models import Post
+from posts.utils import bump_feed_version, bump_page_version
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет HTML текста постов, сохраненных до появления text_html '
+        'или в обход save(). С --all пересчитывает все посты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать и уже заполненные, например после смены '
+                 'разметки.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.order_by('pk').only('pk', 'text', 'text_html')
+        if not options['all']:
+            posts = posts.filter(text_html='')
+        last_pk = done = updated = 0
+        while True:
+            batch = list(posts.filter(pk__gt=last_pk)[:options['batch']])
+            if not batch:
+                break
+            # bulk_update не вызывает save(), поэтому updated_at ставится
+            # вручную: по нему меняется ключ закешированной карточки.
+            now = timezone.now()
+            changed = []
+            for post in batch:
+                html = render_text(post.text)
+                if html != post.text_html:
+                    post.text_html = html
+                    post.updated_at = now
+                    changed.append(post)
+            Post.objects.bulk_update(changed, ['text_html', 'updated_at'])
+            done += len(batch)
+            updated += len(changed)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'{done} постов заполнено.')
+        if updated:
+            # Сигналов bulk_update тоже не шлет.
+            bump_feed_version()
+            bump_page_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'HTML текста постов заполнен, изменено {updated}.'))
@@ -0,0 +1,119 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails, variants
+from posts.models import ImageVariant, Post
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT = os.path.join(settings.BASE_DIR, '.warm_thumbnails')
+
+
+def warm(post_id, name):
+    """Миниатюра и варианты одного поста, выполняется в дочернем процессе."""
+    try:
+        thumbnails.generate(name)
+        variants.build(post_id)
+    except Exception:
+        logger.exception('Не удалось прогреть картинку поста %s', post_id)
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует миниатюры и варианты картинок всех постов. '
+        'Прерванный прогрев продолжается с последней готовой пачки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов, 0 - без пула, в текущем процессе.',
+        )
+        parser.add_argument('--chunk', type=int, default=100)
+        parser.add_argument('--checkpoint', default=CHECKPOINT)
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать сначала, не читая контрольную точку.',
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        last_pk = 0 if options['restart'] else read_checkpoint(checkpoint)
+        posts = Post.objects.exclude(image='').order_by('pk')
+        total = posts.filter(pk__gt=last_pk).count()
+        if last_pk:
+            self.stdout.write(f'Продолжаем после поста {last_pk}.')
+        pool = None
+        if options['workers'] > 0:
+            # Дочерние процессы не должны унаследовать открытое соединение.
+            connections.close_all()
+            pool = ProcessPoolExecutor(
+                options['workers'],
+                mp_context=multiprocessing.get_context('fork'),
+            )
+        done = skipped = failed = 0
+        started = time.monotonic()
+        try:
+            while True:
+                chunk = list(
+                    posts.filter(pk__gt=last_pk)
+                    .values_list('pk', 'image')[:options['chunk']]
+                )
+                if not chunk:
+                    break
+                todo = missing(chunk)
+                skipped += len(chunk) - len(todo)
+                if todo:
+                    connections.close_all()
+                    run = pool.map if pool else map
+                    results = list(run(warm, *zip(*todo)))
+                    failed += results.count(False)
+                done += len(chunk)
+                last_pk = chunk[-1][0]
+                write_checkpoint(checkpoint, last_pk)
+                rate = done / max(time.monotonic() - started, 1e-6)
+                self.stdout.write(
+                    f'{done}/{total} постов, пропущено {skipped}, '
+                    f'ошибок {failed}, {rate:.1f} в сек.'
+                )
+        finally:
+            if pool:
+                pool.shutdown()
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS('Миниатюры прогреты.'))
+
+
+def missing(chunk):
+    """Посты пачки без готовой миниатюры или без вариантов."""
+    with_variants = set(
+        ImageVariant.objects.filter(post_id__in=[pk for pk, _ in chunk])
+        .values_list('post_id', 'source')
+    )
+    return [
+        (pk, name) for pk, name in chunk
+        if (pk, name) not in with_variants
+        or thumbnails.ready_thumbnail(name) is None
+    ]
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as file:
+            return int(file.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def write_checkpoint(path, pk):
+    with open(path, 'w') as file:
+        file.write(str(pk))
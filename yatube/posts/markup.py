@@ -0,0 +1,6 @@
+from django.template.defaultfilters import linebreaksbr
+
+
+def render_text(text):
+    """HTML текста поста, считается один раз при сохранении."""
+    return linebreaksbr(text, autoescape=True)
@@ -0,0 +1,63 @@
+# Generated by Django 2.2.16 on 2026-10-17 20:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from posts.constans import TIMELINE_FANOUT_LIMIT
+
+
+def fill_timelines(apps, schema_editor):
+    """Раскладывает посты по лентам существующих подписок."""
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    heavy = set(
+        Follow.objects.values('author')
+        .annotate(followers=models.Count('id'))
+        .filter(followers__gte=TIMELINE_FANOUT_LIMIT)
+        .values_list('author', flat=True)
+    )
+    for follow in Follow.objects.exclude(author_id__in=heavy).iterator():
+        posts = Post.objects.filter(
+            author_id=follow.author_id).values_list('id', 'pub_date')
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(
+                    user_id=follow.user_id, post_id=post_id, pub_date=date)
+                for post_id, date in posts
+            ),
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0010_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-pub_date',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='timeline_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 2.2.16 on 2026-10-17 20:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Coalesce
+
+
+def count_of(queryset, field, outer='pk'):
+    totals = (
+        queryset.filter(**{field: models.OuterRef(outer)})
+        .order_by()
+        .values(field)
+        .annotate(total=models.Count('pk'))
+        .values('total')
+    )
+    return Coalesce(models.Subquery(totals), 0)
+
+
+def fill_counters(apps, schema_editor):
+    """Копия posts.counters.recount на момент миграции."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Profile = apps.get_model('posts', 'Profile')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+
+    Profile.objects.bulk_create(
+        (
+            Profile(user_id=user_id)
+            for user_id in User.objects.filter(
+                profile__isnull=True).values_list('pk', flat=True)
+        ),
+        ignore_conflicts=True,
+    )
+    Profile.objects.update(
+        post_count=count_of(Post.objects, 'author', 'user'),
+        follower_count=count_of(Follow.objects, 'author', 'user'),
+        following_count=count_of(Follow.objects, 'user', 'user'),
+    )
+    Group.objects.update(post_count=count_of(Post.objects, 'group'))
+    Post.objects.update(comment_count=count_of(Comment.objects, 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0012_follow_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Постов'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('follower_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-17 21:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('width', models.PositiveIntegerField()),
+                ('format', models.CharField(max_length=8)),
+                ('file', models.ImageField(upload_to='posts/variants/')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='posts.Post')),
+            ],
+            options={
+                'ordering': ('width',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='imagevariant',
+            constraint=models.UniqueConstraint(fields=('post', 'width', 'format'), name='unique_image_variant'),
+        ),
+    ]
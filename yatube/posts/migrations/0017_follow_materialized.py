@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-17 21:35
+
+from django.db import migrations, models
+
+
+def mark_incomplete(apps, schema_editor):
+    """
+    Подписки, по которым в ленте не все посты автора.
+
+    Это посты, пропущенные при раскладке, пока автор был популярным,
+    и посты старше прежнего лимита заполнения ленты при подписке.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    posts = dict(
+        Post.objects.order_by().values('author')
+        .annotate(count=models.Count('id')).values_list('author', 'count')
+    )
+    entries = {
+        (user, author): count
+        for user, author, count in TimelineEntry.objects.order_by().values(
+            'user', 'post__author',
+        ).annotate(count=models.Count('id')).values_list(
+            'user', 'post__author', 'count',
+        )
+    }
+    incomplete = [
+        pk for pk, user, author in Follow.objects.values_list(
+            'pk', 'user', 'author',
+        ).iterator()
+        if entries.get((user, author), 0) < posts.get(author, 0)
+    ]
+    for start in range(0, len(incomplete), 500):
+        Follow.objects.filter(
+            pk__in=incomplete[start:start + 500],
+        ).update(materialized=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_text_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='follow',
+            name='materialized',
+            field=models.BooleanField(default=True, help_text='Если нет, посты автора подмешиваются в ленту при чтении', verbose_name='Посты автора в ленте'),
+        ),
+        migrations.RunPython(mark_incomplete, migrations.RunPython.noop),
+    ]
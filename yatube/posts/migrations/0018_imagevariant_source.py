@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-17 21:46
+
+from django.db import migrations, models
+
+
+def fill_source(apps, schema_editor):
+    """Существующие варианты считаются собранными из текущей картинки."""
+    ImageVariant = apps.get_model('posts', 'ImageVariant')
+    Post = apps.get_model('posts', 'Post')
+    ImageVariant.objects.update(source=models.Subquery(
+        Post.objects.filter(pk=models.OuterRef('post_id')).values('image'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_follow_materialized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagevariant',
+            name='source',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.RunPython(fill_source, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,9 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, transaction
 
 from .constans import STR_LENG
+from .markup import render_text
+from .rows import FEED_FIELDS, FeedRowIterable
 
 User = get_user_model()
 
@@ -14,11 +16,72 @@ class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name='Название группы')
     slug = models.SlugField('Путь к странице', unique=True)
     description = models.TextField(verbose_name='Описание')
+    post_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Постов',
+    )
 
     def __str__(self):
         return self.title
 
 
+class Profile(models.Model):
+    """
+    Счетчики пользователя.
+
+    Модель пользователя стандартная, поэтому денормализованные
+    счетчики лежат в отдельной таблице один-к-одному.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+    )
+    post_count = models.PositiveIntegerField(default=0, verbose_name='Постов')
+    follower_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок',
+    )
+
+    def __str__(self):
+        return str(self.user)
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """
+        Посты для лент с карточками posts/includes/card_post.html.
+
+        Автор и группа подтягиваются одним JOIN, читаются только поля,
+        которые выводит карточка. Варианты картинок - одним запросом
+        на страницу.
+        """
+        return self.select_related('author', 'group').only(
+            'id', 'text', 'text_html', 'pub_date', 'updated_at', 'image',
+            'author_id', 'group_id',
+            'author__username', 'author__first_name', 'author__last_name',
+            'group__slug',
+        ).prefetch_related('variants')
+
+    def feed_rows(self):
+        """
+        Те же посты, но легкими объектами FeedPost вместо моделей.
+
+        Вызывается последним, после фильтров и аннотаций: читает
+        колонки карточки и все аннотации одним values_list().
+        """
+        clone = self.prefetch_related(None).values_list(
+            *FEED_FIELDS, *self.query.annotations)
+        clone._iterable_class = FeedRowIterable
+        return clone
+
+
 class Post(models.Model):
     """
     Создаем модель поста.
@@ -29,7 +92,13 @@ class Post(models.Model):
         verbose_name='Пост',
         help_text='Введите текст поста',
     )
+    text_html = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Пост в HTML',
+    )
     pub_date = models.DateTimeField(auto_now_add=True, verbose_name='Дата')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Изменен')
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -50,15 +119,43 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True,
     )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев',
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_pub_date_id_idx',
+            ),
+        )
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
     def __str__(self):
         return self.text[:STR_LENG]
 
+    def save(self, *args, **kwargs):
+        self.text_html = render_text(self.text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'text_html'}
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     """
@@ -83,6 +180,12 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_created_idx',
+            ),
+        )
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комменты'
 
@@ -90,6 +193,25 @@ class Comment(models.Model):
         return self.text[:STR_LENG]
 
 
+class FollowQuerySet(models.QuerySet):
+    def follow(self, user, author):
+        """
+        Подписка одним INSERT.
+
+        Повторная подписка и подписка на себя упираются в ограничения
+        таблицы и молча игнорируются, поэтому двойной клик безопасен.
+        """
+        try:
+            with transaction.atomic():
+                return self.create(user=user, author=author)
+        except IntegrityError:
+            return None
+
+    def unfollow(self, user, author):
+        """Отписка, повторная отписка ничего не делает."""
+        return self.filter(user=user, author=author).delete()
+
+
 class Follow(models.Model):
     """Создаем модель подписок."""
 
@@ -104,3 +226,87 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following',
     )
+    materialized = models.BooleanField(
+        default=True,
+        verbose_name='Посты автора в ленте',
+        help_text='Если нет, посты автора подмешиваются в ленту при чтении',
+    )
+
+    objects = FollowQuerySet.as_manager()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow',
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='prevent_self_follow',
+            ),
+        )
+
+
+class TimelineEntry(models.Model):
+    """
+    Пост в материализованной ленте подписок читателя.
+
+    Записи раскладываются при публикации поста (fan-out on write),
+    pub_date копируется из поста для сортировки по индексу.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_entry',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_user_pub_date_idx',
+            ),
+        )
+
+
+class ImageVariant(models.Model):
+    """
+    Уменьшенная копия картинки поста для srcset.
+
+    Шаблоны берут варианты из таблицы, а не проверяют файлы в хранилище.
+    """
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='variants',
+    )
+    # Картинка поста, из которой собран вариант: после смены картинки
+    # старые варианты не попадают в srcset, пока не собраны новые.
+    source = models.CharField(max_length=100, default='')
+    width = models.PositiveIntegerField()
+    format = models.CharField(max_length=8)
+    file = models.ImageField(upload_to='posts/variants/')
+
+    class Meta:
+        ordering = ('width',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('post', 'width', 'format'),
+                name='unique_image_variant',
+            ),
+        )
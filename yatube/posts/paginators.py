@@ -0,0 +1,148 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class KeysetPaginator(Paginator):
+    """
+    Пагинатор по ключу (pub_date, id) вместо LIMIT/OFFSET.
+
+    Соседние страницы задаются непрозрачными курсорами next_cursor и
+    previous_cursor, поэтому дальняя страница стоит столько же,
+    сколько первая, а COUNT(*) для них не выполняется.
+
+    Для переходов по номеру страницы число объектов берется из count
+    (число или функция, например денормализованный счетчик). Без него
+    страница читается с одной лишней строкой, которая показывает,
+    есть ли следующая.
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id'),
+                 count=None, **kwargs):
+        self.keys = keys
+        self.total = count
+        self.next_cursor = None
+        self.previous_cursor = None
+        ordering = ['-' + key for key in keys]
+        super().__init__(object_list.order_by(*ordering), per_page, **kwargs)
+
+    def cursor_page(self, after=None, before=None):
+        """Страница после курсора after или перед курсором before.
+
+        Пустой before означает последнюю страницу. Это обычный Page,
+        но номер у нее всегда 1, а has_next() и has_previous() считаются
+        от count и для нее ничего не значат: соседние страницы задают
+        только next_cursor и previous_cursor пагинатора.
+        """
+        backward = before is not None
+        cursor = self.decode(before if backward else after)
+        queryset = self.object_list
+        if backward:
+            queryset = queryset.reverse()
+        if cursor is not None:
+            queryset = queryset.filter(self._seek(cursor, backward))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backward:
+            rows.reverse()
+        if not rows:
+            return Page(rows, 1, self)
+        first, last = self.encode(rows[0]), self.encode(rows[-1])
+        if backward:
+            self.previous_cursor = first if has_more else None
+            self.next_cursor = last if cursor is not None else None
+        else:
+            self.previous_cursor = first if cursor is not None else None
+            self.next_cursor = last if has_more else None
+        return Page(rows, 1, self)
+
+    @cached_property
+    def count(self):
+        """Число объектов из счетчика, COUNT(*) - только если его нет."""
+        if self.total is None:
+            return super().count
+        return self.total() if callable(self.total) else self.total
+
+    def validate_number(self, number):
+        if self.total is not None:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        if self.total is not None:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('That page contains no results')
+        # Оценка снизу: ровно столько, чтобы has_next() видел лишнюю строку.
+        self.__dict__['count'] = bottom + len(rows)
+        self.__dict__.pop('num_pages', None)
+        return Page(rows[:self.per_page], number, self)
+
+    def get_page(self, number):
+        """Страница по номеру через OFFSET, оставлена для старых ссылок.
+
+        Номер за пределами ленты открывает последнюю страницу.
+        """
+        try:
+            page = self.page(number)
+        except PageNotAnInteger:
+            page = self.page(1)
+        except EmptyPage:
+            return self.cursor_page(before='')
+        if page.has_previous():
+            self.previous_cursor = self.encode(page[0])
+        if page.has_next():
+            self.next_cursor = self.encode(page[len(page) - 1])
+        return page
+
+    def encode(self, obj):
+        values = [str(getattr(obj, key)) for key in self.keys]
+        raw = json.dumps(values).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode(self, token):
+        """Значения ключа из курсора, None для пустого или битого."""
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            values = json.loads(raw.decode())
+            if len(values) != len(self.keys):
+                return None
+            return [
+                self._key_field(key).to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def _key_field(self, key):
+        """Поле модели или аннотации, по которому идет ключ."""
+        annotation = self.object_list.query.annotations.get(key)
+        if annotation is not None:
+            return annotation.output_field
+        return self.object_list.model._meta.get_field(key)
+
+    def _seek(self, cursor, backward):
+        """Условие (k1, k2, ...) < cursor (или > при обратном ходе)."""
+        lookup = 'gt' if backward else 'lt'
+        condition = Q()
+        equal = {}
+        for key, value in zip(self.keys, cursor):
+            condition |= Q(**equal, **{f'{key}__{lookup}': value})
+            equal[key] = value
+        return condition
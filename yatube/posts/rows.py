@@ -0,0 +1,183 @@
+from django.conf import settings
+from django.db.models.query import ValuesListIterable
+from django.urls import reverse
+
+# Колонки, которые читает карточка поста, в порядке разбора строки.
+FEED_FIELDS = (
+    'id', 'text', 'text_html', 'pub_date', 'updated_at', 'image',
+    'author_id', 'author__username', 'author__first_name',
+    'author__last_name',
+    'group_id', 'group__slug',
+)
+
+
+class Row:
+    """
+    Легкая замена экземпляра модели для шаблонов лент.
+
+    Без _state и __dict__, только нужные карточке поля. Равна
+    экземпляру своей модели с тем же pk, как и сами модели.
+    """
+
+    __slots__ = ('id',)
+    label = None
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __eq__(self, other):
+        if isinstance(other, type(self)):
+            return self.pk == other.pk
+        meta = getattr(other, '_meta', None)
+        if meta is not None and meta.label == self.label:
+            return self.pk == other.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.pk)
+
+
+class FeedAuthor(Row):
+    __slots__ = ('username', 'first_name', 'last_name')
+    label = settings.AUTH_USER_MODEL
+
+    def __init__(self, pk, username, first_name, last_name):
+        self.id = pk
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+
+    def __str__(self):
+        return self.username
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'.strip()
+
+
+class FeedGroup(Row):
+    __slots__ = ('slug',)
+    label = 'posts.Group'
+
+    def __init__(self, pk, slug):
+        self.id = pk
+        self.slug = slug
+
+    def __str__(self):
+        return self.slug
+
+
+class FeedImage:
+    """Имя файла картинки с хранилищем, как у FieldFile."""
+
+    __slots__ = ('name', 'storage')
+
+    def __init__(self, name, storage):
+        self.name = name
+        self.storage = storage
+
+    def __bool__(self):
+        return bool(self.name)
+
+    def __str__(self):
+        return self.name or ''
+
+    def __eq__(self, other):
+        return self.name == getattr(other, 'name', other)
+
+    def __hash__(self):
+        return hash(self.name)
+
+    @property
+    def url(self):
+        return self.storage.url(self.name)
+
+
+class FeedPost(Row):
+    __slots__ = (
+        'text', 'text_html', 'pub_date', 'updated_at', 'image',
+        'author', 'group', 'srcsets', 'annotations',
+    )
+    label = 'posts.Post'
+
+    def __getattr__(self, name):
+        # Аннотации запроса, например ключи ленты подписок.
+        if name == 'annotations':
+            raise AttributeError(name)
+        try:
+            return self.annotations[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @property
+    def author_id(self):
+        return self.author.id
+
+    @property
+    def group_id(self):
+        return self.group.id if self.group else None
+
+    def get_absolute_url(self):
+        return reverse('posts:post_detail', args=(self.id,))
+
+
+class FeedRowIterable(ValuesListIterable):
+    """
+    Строки values_list(FEED_FIELDS, *аннотации) в виде FeedPost.
+
+    Автор и группа создаются по одному на страницу, варианты картинок
+    читаются одним запросом вместо prefetch_related.
+    """
+
+    def __iter__(self):
+        model = self.queryset.model
+        storage = model._meta.get_field('image').storage
+        names = self.queryset._fields[len(FEED_FIELDS):]
+        authors, groups, posts = {}, {}, []
+        for row in super().__iter__():
+            (pk, text, text_html, pub_date, updated_at, image,
+             author_id, username, first_name, last_name,
+             group_id, slug) = row[:len(FEED_FIELDS)]
+            post = FeedPost.__new__(FeedPost)
+            post.id = pk
+            post.text = text
+            post.text_html = text_html
+            post.pub_date = pub_date
+            post.updated_at = updated_at
+            post.image = FeedImage(image, storage)
+            author = authors.get(author_id)
+            if author is None:
+                author = authors[author_id] = FeedAuthor(
+                    author_id, username, first_name, last_name)
+            post.author = author
+            group = None
+            if group_id is not None:
+                group = groups.get(group_id)
+                if group is None:
+                    group = groups[group_id] = FeedGroup(group_id, slug)
+            post.group = group
+            post.srcsets = {}
+            post.annotations = dict(zip(names, row[len(FEED_FIELDS):]))
+            posts.append(post)
+        attach_srcsets(model, posts)
+        return iter(posts)
+
+
+def attach_srcsets(model, posts):
+    """srcset по форматам для постов с картинкой, одним запросом."""
+    with_image = {post.id: post for post in posts if post.image}
+    if not with_image:
+        return
+    variant_model = model.variants.rel.related_model
+    storage = variant_model._meta.get_field('file').storage
+    sources = {}
+    variants = variant_model.objects.filter(
+        post_id__in=list(with_image),
+    ).values_list('post_id', 'source', 'format', 'width', 'file')
+    for post_id, source, fmt, width, name in variants:
+        if source != with_image[post_id].image.name:
+            continue
+        sources.setdefault((post_id, fmt), []).append(
+            f'{storage.url(name)} {width}w')
+    for (post_id, fmt), items in sources.items():
+        with_image[post_id].srcsets[fmt] = ', '.join(items)
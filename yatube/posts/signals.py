@@ -0,0 +1,151 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import timeline
+from .counters import shift
+from .models import Comment, Follow, Group, Post, Profile, User
+from .utils import bump_feed_version, bump_page_version, forget
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_feed(sender, **kwargs):
+    """Пост или группа изменились - страницы ленты устарели."""
+    bump_feed_version()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_pages(sender, **kwargs):
+    """Страницы в кеше целиком показывают и комментарии, и счетчики."""
+    bump_page_version()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, update_fields=None, **kwargs):
+    """Имя автора есть на карточках и страницах, вход на сайт не в счет."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_feed_version()
+    bump_page_version()
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def fill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_in(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def clear_timeline(sender, instance, **kwargs):
+    timeline.drop(instance)
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    """Запоминает прежнюю группу поста, чтобы поправить счетчики."""
+    if instance.pk and not raw:
+        instance._old_group_id = Post.objects.filter(
+            pk=instance.pk,
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        shift(Profile.objects.filter(user=instance.author_id),
+              'post_count', 1)
+        shift_group(instance.group_id, 1)
+        return
+    old_group_id = getattr(instance, '_old_group_id', instance.group_id)
+    if old_group_id != instance.group_id:
+        shift_group(old_group_id, -1)
+        shift_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    shift(Profile.objects.filter(user=instance.author_id), 'post_count', -1)
+    shift_group(instance.group_id, -1)
+
+
+def shift_group(group_id, delta):
+    if group_id is not None:
+        shift(Group.objects.filter(pk=group_id), 'post_count', delta)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        shift(Post.objects.filter(pk=instance.post_id), 'comment_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    shift(Post.objects.filter(pk=instance.post_id), 'comment_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        shift(Profile.objects.filter(user=instance.author_id),
+              'follower_count', 1)
+        shift(Profile.objects.filter(user=instance.user_id),
+              'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    shift(Profile.objects.filter(user=instance.author_id),
+          'follower_count', -1)
+    shift(Profile.objects.filter(user=instance.user_id),
+          'following_count', -1)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def forget_group(sender, instance, **kwargs):
+    forget('group', instance.pk)
+
+
+@receiver(post_save, sender=User)
+def forget_author(sender, instance, **kwargs):
+    forget('author', instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def forget_post_counters(sender, instance, **kwargs):
+    """Счетчики постов автора и групп поменялись."""
+    forget('author', instance.author_id)
+    forget(
+        'group',
+        instance.group_id,
+        getattr(instance, '_old_group_id', None),
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def forget_follow_counters(sender, instance, **kwargs):
+    forget('author', instance.user_id, instance.author_id)
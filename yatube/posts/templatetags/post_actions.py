@@ -0,0 +1,27 @@
+from django import template
+
+from posts.forms import CommentForm
+from posts.models import Follow
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def is_following(context, username):
+    """
+    Подписан ли пользователь на автора.
+
+    Страница профиля уже передает following, запрос нужен только
+    при дорисовке закешированной страницы.
+    """
+    if 'following' in context:
+        return context['following']
+    user = context['user']
+    return user.is_authenticated and Follow.objects.filter(
+        user=user, author__username=username).exists()
+
+
+@register.simple_tag(takes_context=True)
+def comment_form(context):
+    """Форма комментария из контекста поста или пустая."""
+    return context.get('form') or CommentForm()
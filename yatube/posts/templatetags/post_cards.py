@@ -0,0 +1,55 @@
+import zlib
+
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts.constans import CARD_CACHE_TIMEOUT
+from posts.thumbnails import ready_thumbnail
+
+register = template.Library()
+
+
+def card_key(post, in_group):
+    """
+    Ключ карточки: пост, время его изменения и все, что карточка берет
+    у автора и группы, поэтому переименование не оставит старую карточку.
+    """
+    author = post.author
+    related = zlib.crc32('|'.join((
+        author.username,
+        author.first_name,
+        author.last_name,
+        post.group.slug if post.group_id else '',
+    )).encode())
+    return (
+        f'card:{post.pk}:{post.updated_at.timestamp()}:'
+        f'{related}:{int(in_group)}'
+    )
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """
+    Готовый HTML карточек постов страницы по порядку.
+
+    Готовые карточки берутся из кеша одним get_many, рендерятся только
+    недостающие. Карточка с заглушкой вместо миниатюры не кешируется.
+    """
+    group = context.get('group')
+    posts = {card_key(post, bool(group)): post for post in posts}
+    cards = cache.get_many(list(posts))
+    fresh = {}
+    for key, post in posts.items():
+        if key in cards:
+            continue
+        cards[key] = render_to_string(
+            'posts/includes/card_post.html',
+            {'post': post, 'group': group},
+        )
+        if not post.image or ready_thumbnail(post.image) is not None:
+            fresh[key] = cards[key]
+    if fresh:
+        cache.set_many(fresh, CARD_CACHE_TIMEOUT)
+    return [mark_safe(cards[key]) for key in posts]
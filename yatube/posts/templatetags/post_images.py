@@ -0,0 +1,41 @@
+import logging
+
+from django import template
+from django.conf import settings
+
+from posts import thumbnails, variants
+from posts.rows import FeedPost
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image):
+    """
+    Миниатюра картинки поста, если она уже готова.
+
+    Если нет - генерация уходит в фоновую очередь, а шаблон
+    показывает заглушку. Без фоновых потоков миниатюра, как у тега
+    sorl, собирается сразу. Ошибки не ломают страницу.
+    """
+    try:
+        thumbnail = thumbnails.ready_thumbnail(image)
+        if thumbnail is None and image and image.storage.exists(image.name):
+            if settings.IMAGE_WORKERS:
+                thumbnails.schedule(image.name)
+            else:
+                thumbnail = thumbnails.make(image.name)
+    except Exception:
+        logger.exception('Не удалось получить миниатюру %s', image)
+        return None
+    return thumbnail
+
+
+@register.simple_tag
+def post_srcsets(post):
+    """srcset по форматам, варианты берутся из prefetch_related."""
+    if isinstance(post, FeedPost):
+        return post.srcsets
+    return variants.srcsets(post)
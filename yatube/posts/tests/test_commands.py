@@ -0,0 +1,145 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.management.commands.explain_feeds import full_scans
+from posts.markup import render_text
+from posts.models import Post
+from posts.tests.test_thumbnails import SMALL_GIF
+from posts.thumbnails import ready_thumbnail
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class ExplainFeedsCommandTest(TestCase):
+    def test_feeds_use_indexes(self):
+        """Ни одна лента не читает таблицу целиком."""
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        for feed in ('index', 'group_posts', 'profile', 'follow_index'):
+            with self.subTest(feed=feed):
+                self.assertIn(f'== {feed}', out.getvalue())
+
+    def test_full_scan_detected(self):
+        plan = Post.objects.filter(text='Пост').order_by().explain()
+        self.assertTrue(full_scans(plan))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class WarmThumbnailsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='auth')
+        cls.posts = [
+            Post.objects.create(
+                author=author,
+                text=f'{num}Пост',
+                image=SimpleUploadedFile(
+                    f'{num}.gif', SMALL_GIF, 'image/gif'),
+            )
+            for num in range(3)
+        ]
+        Post.objects.create(author=author, text='Без картинки')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'checkpoint')
+
+    def warm(self, **options):
+        out = StringIO()
+        call_command(
+            'warm_thumbnails', workers=0, chunk=2,
+            checkpoint=self.checkpoint, stdout=out, **options)
+        return out.getvalue()
+
+    def test_warms_all_images(self):
+        out = self.warm()
+        self.assertIn('3/3 постов, пропущено 0', out)
+        for post in self.posts:
+            with self.subTest(post=post.pk):
+                self.assertIsNotNone(ready_thumbnail(post.image))
+                self.assertTrue(post.variants.exists())
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_skips_warm_images(self):
+        self.warm()
+        self.assertIn('3/3 постов, пропущено 3', self.warm())
+
+    def test_resumes_from_checkpoint(self):
+        with open(self.checkpoint, 'w') as file:
+            file.write(str(self.posts[0].pk))
+        out = self.warm()
+        self.assertIn('2/2 постов', out)
+        self.assertFalse(self.posts[0].variants.exists())
+        self.assertIn('3/3 постов', self.warm(restart=True))
+
+
+class FillTextHtmlCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    def test_fills_posts_saved_without_html(self):
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'<b>{num}</b>\nстрока')
+            for num in range(5)
+        )
+        filled = Post.objects.create(author=self.author, text='Готовый')
+        Post.objects.filter(pk=filled.pk).update(text_html='старый')
+        out = StringIO()
+        call_command('fill_text_html', batch=2, stdout=out)
+        self.assertIn('5 постов заполнено', out.getvalue())
+        self.assertFalse(Post.objects.filter(text_html='').exists())
+        post = Post.objects.exclude(pk=filled.pk).first()
+        self.assertEqual(post.text_html, render_text(post.text))
+        self.assertIn('&lt;b&gt;', post.text_html)
+        self.assertEqual(
+            Post.objects.get(pk=filled.pk).text_html, 'старый')
+        call_command('fill_text_html', all=True, stdout=StringIO())
+        self.assertEqual(Post.objects.get(pk=filled.pk).text_html, 'Готовый')
+
+    def test_all_refreshes_cached_pages(self):
+        """После смены разметки --all сбрасывает карточки и страницы."""
+        cache.clear()
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertContains(self.client.get(reverse('posts:index')), 'Пост')
+        updated_at = post.updated_at
+        with mock.patch(
+            'posts.management.commands.fill_text_html.render_text',
+            return_value='<em>Новая разметка</em>',
+        ):
+            call_command('fill_text_html', all=True, stdout=StringIO())
+        self.assertGreater(Post.objects.get().updated_at, updated_at)
+        self.assertContains(
+            self.client.get(reverse('posts:index')),
+            '<em>Новая разметка</em>',
+        )
+
+
+class BenchFeedCommandTest(TestCase):
+    def test_compares_both_paths(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Пост')
+        out = StringIO()
+        call_command('bench_feed', repeat=1, stdout=out)
+        self.assertIn('модели: 1 постов', out.getvalue())
+        self.assertIn('строки: 1 постов', out.getvalue())
@@ -1,5 +1,7 @@
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -7,6 +9,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.cache import cache
+from PIL import Image
 
 from ..models import Group, Post, Comment
 from ..forms import PostForm, CommentForm
@@ -189,6 +192,76 @@ class ImageFormTests(TestCase):
         )
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    """Картинки проверяются и нормализуются еще при загрузке."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client(enforce_csrf_checks=True)
+        self.authorized_client.force_login(self.author)
+        self.authorized_client.get(reverse('posts:post_create'))
+        self.csrf_token = self.authorized_client.cookies['csrftoken'].value
+
+    def upload(self, name, content):
+        return self.authorized_client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(name, content),
+            'csrfmiddlewaretoken': self.csrf_token,
+        })
+
+    def jpeg(self, size, orientation=None):
+        exif = Image.Exif()
+        if orientation:
+            exif[0x0112] = orientation
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(
+            buffer, 'JPEG', exif=exif.tobytes())
+        return buffer.getvalue()
+
+    def test_csrf_still_checked(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.author)
+        response = client.post(reverse('posts:post_create'), {'text': 'Пост'})
+        self.assertTemplateUsed(response, 'core/403csrf.html')
+        self.assertFalse(Post.objects.exists())
+
+    def test_not_an_image_rejected(self):
+        response = self.upload('fake.jpg', b'not an image' * 10)
+        self.assertFormError(
+            response, 'form', 'image', 'Файл не является картинкой.')
+        self.assertFalse(Post.objects.exists())
+
+    def test_oversized_rejected_while_streaming(self):
+        with mock.patch('posts.uploads.IMAGE_UPLOAD_MAX_SIZE', 1024):
+            response = self.upload('big.jpg', self.jpeg((200, 200)) * 10)
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка больше 0 МБ.')
+        self.assertFalse(Post.objects.exists())
+
+    def test_huge_image_downscaled_without_exif(self):
+        """EXIF-поворот применяется, сами метаданные не сохраняются."""
+        response = self.upload('big.jpg', self.jpeg((4000, 2000), 6))
+        self.assertEqual(response.status_code, 302)
+        with Image.open(Post.objects.get().image) as image:
+            self.assertEqual(image.size, (1280, 2560))
+            self.assertFalse(image.getexif())
+
+    def test_small_image_stored_as_is(self):
+        content = self.jpeg((100, 50))
+        self.upload('small.jpg', content)
+        self.assertEqual(Post.objects.get().image.read(), content)
+
+
 class CommentFormTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -1,8 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
 from django.test import TestCase
 
 from posts.constans import STR_LENG
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, Profile
 
 
 User = get_user_model()
@@ -44,8 +48,106 @@ class PostModelTest(TestCase):
         expected_object_name = post.text[:STR_LENG]
         self.assertEqual(expected_object_name, str(post))
 
+    def test_text_html_follows_text(self):
+        """HTML текста считается при сохранении, в том числе update_fields."""
+        post = Post.objects.create(author=self.user, text='<i>a</i>\nb')
+        self.assertEqual(post.text_html, '&lt;i&gt;a&lt;/i&gt;<br>b')
+        post.text = 'c\nd'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, 'c<br>d')
+
     def test_models_group_have_correct_object_names(self):
         """Проверяем, что у моделей корректно работает __str__."""
         group = PostModelTest.group
         expected_object_name = group.title
         self.assertEqual(expected_object_name, str(group))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def assertCounts(self, obj, **counts):
+        obj.refresh_from_db()
+        for field, expected in counts.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(obj, field), expected)
+
+    def test_counters_follow_writes(self):
+        """Счетчики меняются вместе с постами, комментами и подписками."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Коммент')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertCounts(self.author.profile, post_count=1, follower_count=1)
+        self.assertCounts(self.reader.profile, following_count=1)
+        self.assertCounts(self.group, post_count=1)
+        self.assertCounts(post, comment_count=1)
+
+        post.group = None
+        post.save()
+        self.assertCounts(self.group, post_count=0)
+        follow.delete()
+        post.delete()
+        self.assertCounts(self.author.profile, post_count=0, follower_count=0)
+        self.assertCounts(self.reader.profile, following_count=0)
+
+    def test_recount_repairs_drift(self):
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост')
+        Profile.objects.update(post_count=7, follower_count=3)
+        Group.objects.update(post_count=5)
+        Profile.objects.filter(user=self.reader).delete()
+        call_command('recount', stdout=StringIO())
+        self.assertCounts(self.author.profile, post_count=1, follower_count=0)
+        self.assertCounts(self.group, post_count=1)
+        self.assertCounts(post, comment_count=0)
+        self.assertTrue(Profile.objects.filter(user=self.reader).exists())
+
+
+class FeedRowsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост',
+            image='posts/small.gif')
+        cls.other = Post.objects.create(author=cls.author, text='Без группы')
+
+    def test_rows_match_models(self):
+        """Строки ленты отдают то же, что и модели, и равны им."""
+        rows = list(Post.objects.for_feed().feed_rows())
+        self.assertEqual(rows, list(Post.objects.for_feed()))
+        row, other = rows[1], rows[0]
+        self.assertEqual(row.author, self.author)
+        self.assertEqual(row.group, self.group)
+        self.assertEqual(row.image, self.post.image)
+        self.assertEqual(row.image.url, self.post.image.url)
+        self.assertEqual(row.text_html, self.post.text_html)
+        self.assertEqual(row.author.get_full_name(), 'Имя Фамилия')
+        self.assertEqual(str(row.author), 'author')
+        self.assertEqual(row.get_absolute_url(), f'/posts/{self.post.pk}/')
+        self.assertIsNone(other.group)
+        self.assertFalse(other.image)
+        self.assertIs(row.author, other.author)
+        self.assertFalse(hasattr(row, '__dict__'))
+
+    def test_rows_keep_annotations(self):
+        row = Post.objects.for_feed().annotate(
+            feed_id=F('id')).feed_rows().get(pk=self.post.pk)
+        self.assertEqual(row.feed_id, self.post.pk)
+        with self.assertRaises(AttributeError):
+            row.missing
@@ -0,0 +1,182 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import thumbnails, variants
+from ..constans import IMAGE_VARIANT_WIDTHS
+from ..models import ImageVariant, Post
+from ..utils import feed_version
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+        cache.clear()
+
+    def test_ready_thumbnail_does_not_generate(self):
+        """Без фоновой генерации готовой миниатюры нет."""
+        self.assertIsNone(thumbnails.ready_thumbnail(self.post.image))
+        self.assertIsNone(thumbnails.ready_thumbnail(None))
+
+    def test_generate_makes_thumbnail_ready(self):
+        thumbnails.generate(self.post.image.name)
+        thumbnail = thumbnails.ready_thumbnail(self.post.image)
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual(list(thumbnail.size), [960, 339])
+
+    def test_generate_logs_errors(self):
+        """Ошибка в фоновом потоке только пишется в лог."""
+        name = self.post.image.name
+        with mock.patch.object(
+            thumbnails, 'get_thumbnail', side_effect=OSError
+        ), self.assertLogs('posts.thumbnails', 'ERROR'):
+            thumbnails._run(name, thumbnails.generate, name)
+        self.assertNotIn(name, thumbnails._pending)
+
+    @override_settings(IMAGE_WORKERS=1)
+    def test_page_shows_placeholder_and_schedules(self):
+        """Пока миниатюры нет, страница отдает заглушку."""
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            response = self.client.get(
+                reverse('posts:post_detail', args=(self.post.id,)))
+        schedule.assert_called_once_with(self.post.image.name)
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+        self.assertNotContains(response, '<img class="card-img')
+
+    def test_page_without_workers_makes_thumbnail(self):
+        """Без фоновых потоков миниатюра собирается при рендере."""
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            response = self.client.get(
+                reverse('posts:post_detail', args=(self.post.id,)))
+        schedule.assert_not_called()
+        self.assertContains(response, '<img class="card-img')
+        self.assertIsNotNone(thumbnails.ready_thumbnail(self.post.image))
+
+    def test_generate_refreshes_feed(self):
+        """Готовая миниатюра сбрасывает ленты с заглушкой."""
+        before = feed_version()
+        thumbnails.generate(self.post.image.name)
+        self.assertNotEqual(feed_version(), before)
+
+    def test_page_shows_ready_thumbnail(self):
+        thumbnails.generate(self.post.image.name)
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            response = self.client.get(reverse('posts:index'))
+        schedule.assert_not_called()
+        self.assertContains(response, '<img class="card-img')
+
+    def test_create_schedules_after_commit(self):
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            self.authorized_client.post(reverse('posts:post_create'), {
+                'text': 'Новый пост',
+                'image': SimpleUploadedFile(
+                    'new.gif', SMALL_GIF, 'image/gif'),
+            })
+        post = Post.objects.get(text='Новый пост')
+        schedule.assert_called_once_with(post.image.name)
+
+    def test_build_variants(self):
+        """Варианты есть для каждой ширины и доступного формата."""
+        variants.build(self.post.id)
+        self.assertEqual(
+            set(self.post.variants.values_list('width', 'format')),
+            {(w, fmt) for w in IMAGE_VARIANT_WIDTHS[:1]
+             for fmt in variants.FORMATS},
+        )
+        self.assertIn('jpeg', variants.FORMATS)
+        variant = self.post.variants.get(format='jpeg')
+        self.assertEqual(list(variant.file.open().read(3)), [0xFF, 0xD8, 0xFF])
+
+    def test_build_refreshes_cards(self):
+        """Готовые варианты меняют updated_at, карточка рендерится заново."""
+        before = Post.objects.get(pk=self.post.pk).updated_at
+        variants.build(self.post.id)
+        self.assertGreater(
+            Post.objects.get(pk=self.post.pk).updated_at, before)
+
+    def test_widths_do_not_upscale(self):
+        self.assertEqual(variants.widths(700), [320, 640])
+        self.assertEqual(variants.widths(10), [320])
+
+    def test_rebuild_replaces_variants(self):
+        variants.build(self.post.id)
+        old = self.post.variants.get(format='jpeg')
+        variants.build(self.post.id)
+        self.assertFalse(ImageVariant.objects.filter(pk=old.pk).exists())
+        self.assertFalse(old.file.storage.exists(old.file.name))
+
+    def test_page_shows_srcset(self):
+        thumbnails.generate(self.post.image.name)
+        variants.build(self.post.id)
+        variant = self.post.variants.get(format='jpeg')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, f'srcset="{variant.file.url} 320w"')
+
+    def test_old_variants_hidden_after_image_change(self):
+        """Варианты прежней картинки не попадают в srcset новой."""
+        variants.build(self.post.id)
+        Post.objects.filter(pk=self.post.pk).update(image='posts/new.gif')
+        post = Post.objects.for_feed().get(pk=self.post.pk)
+        self.assertEqual(variants.srcsets(post), {})
+        row = Post.objects.for_feed().feed_rows().get(pk=self.post.pk)
+        self.assertEqual(row.srcsets, {})
+
+    @override_settings(IMAGE_WORKERS=1)
+    def test_resubmitted_job_runs_again(self):
+        """Задача, поставленная во время прежней, не теряется."""
+        job = mock.Mock()
+        key = ('variants', self.post.id)
+        with mock.patch.object(thumbnails, 'executor') as executor:
+            thumbnails._submit(key, job, self.post.id)
+            thumbnails._submit(key, job, self.post.id)
+            self.assertEqual(executor().submit.call_count, 1)
+            thumbnails._run(key, job, self.post.id)
+            self.assertEqual(executor().submit.call_count, 2)
+            self.assertIn(key, thumbnails._pending)
+            thumbnails._run(key, job, self.post.id)
+        self.assertEqual(job.call_count, 2)
+        self.assertNotIn(key, thumbnails._pending)
+
+    def test_edit_without_image_does_not_schedule(self):
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            self.authorized_client.post(
+                reverse('posts:post_edit', args=(self.post.id,)),
+                {'text': 'Другой текст'},
+            )
+        schedule.assert_not_called()
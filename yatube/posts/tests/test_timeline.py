@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.constans import POST_LIMIT
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.stranger = User.objects.create_user(username='stranger')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed(self, **params):
+        response = self.reader_client.get(
+            reverse('posts:follow_index'), params)
+        return response.context['page_obj']
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает только в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists())
+        self.assertFalse(self.stranger.timeline.exists())
+        self.assertEqual(list(self.feed()), [post])
+
+    def test_follow_and_unfollow_update_timeline(self):
+        """Подписка заполняет ленту постами автора, отписка их убирает."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(list(self.feed()), [post])
+        follow.delete()
+        self.assertFalse(self.reader.timeline.exists())
+        self.assertEqual(list(self.feed()), [])
+
+    def test_timeline_pages(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        for num in range(POST_LIMIT + 3):
+            Post.objects.create(author=self.author, text=f'{num}Пост')
+        first = self.feed()
+        self.assertEqual(len(first), POST_LIMIT)
+        second = self.feed(after=first.paginator.next_cursor)
+        self.assertEqual(len(second), 3)
+        self.assertFalse(set(first) & set(second))
+
+    @mock.patch('posts.timeline.TIMELINE_FANOUT_LIMIT', 1)
+    def test_heavy_author_read_on_demand(self):
+        """Посты автора с большим числом подписчиков читаются при запросе."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        cache.clear()
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertFalse(self.reader.timeline.exists())
+        self.assertEqual(list(self.feed()), [post])
+
+    def test_heavy_author_posts_survive_becoming_normal(self):
+        """Пропущенные при раскладке посты остаются в ленте и потом."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with mock.patch('posts.timeline.TIMELINE_FANOUT_LIMIT', 1):
+            cache.clear()
+            skipped = Post.objects.create(author=self.author, text='Пост')
+            self.assertEqual(list(self.feed()), [skipped])
+        cache.clear()
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(list(self.feed()), [post, skipped])
+
+    def test_follow_of_heavy_author_stays_complete(self):
+        """Подписка на популярного автора видит его посты и потом."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        with mock.patch('posts.timeline.TIMELINE_FANOUT_LIMIT', 0):
+            cache.clear()
+            Follow.objects.create(user=self.reader, author=self.author)
+        cache.clear()
+        self.assertFalse(self.reader.timeline.exists())
+        self.assertEqual(list(self.feed()), [post])
+
+    def test_follow_fills_all_author_posts(self):
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'{num}Пост')
+            for num in range(150)
+        )
+        with mock.patch('posts.timeline.TIMELINE_BATCH', 40):
+            Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.reader.timeline.count(), 150)
+
+    @mock.patch('posts.timeline.TIMELINE_BACKFILL_LIMIT', 2)
+    def test_follow_of_prolific_author_read_on_demand(self):
+        """Посты плодовитого автора не копируются в ленту при подписке."""
+        for num in range(3):
+            Post.objects.create(author=self.author, text=f'{num}Пост')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertFalse(self.reader.timeline.exists())
+        self.assertEqual(len(self.feed()), 3)
@@ -1,11 +1,17 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
 from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
 
-from posts.models import Group, Post, Follow
-from posts.constans import POST_LIMIT
+from posts.models import Comment, Group, Post, Follow
+from posts.constans import COMMENT_LIMIT, POST_LIMIT
+from posts.utils import object_key
 
 User = get_user_model()
 
@@ -113,6 +119,22 @@ class PostPagesTests(TestCase):
             with self.subTest(reverse_name=reverse_name):
                 self.assertEqual(response_name, reverse_name)
 
+    def test_group_post_page_shows_only_group_posts(self):
+        """В ленте группы нет постов других групп и постов без группы."""
+        other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Другое описание',
+        )
+        Post.objects.create(author=self.author, text='Без группы')
+        Post.objects.create(
+            author=self.author, group=other_group, text='Чужой пост')
+        response = self.authorized_client.get(reverse(
+            'posts:group_posts', kwargs={'slug': self.group.slug}))
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+        plan = self.group.posts.for_feed().order_by('-pub_date').explain()
+        self.assertIn('post_group_pub_date_idx', plan)
+
     def test_post_detail_correct_context(self):
         """Шаблон post_detail сформирован с правильным контекстом."""
         first_object = self.authorized_client.get(reverse(
@@ -182,6 +204,18 @@ class PostPagesTests(TestCase):
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(len(response.context['page_obj']), 1)
 
+    def test_index_page_fragment_cache(self):
+        """Страница ленты берется из кеша до сохранения поста."""
+        self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигнала')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.text)
+        self.assertNotContains(response, 'Без сигнала')
+        post = Post.objects.get(pk=self.post.pk)
+        post.save()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Без сигнала')
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -231,6 +265,85 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(
                     len(response.context['page_obj']), self.POST_SECOND_PAGE)
 
+    def test_cursor_pages(self):
+        """Курсоры ведут на соседние страницы без COUNT(*)."""
+        url = reverse('posts:index')
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get(url).context['page_obj']
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries))
+        paginator = first.paginator
+        self.assertIsNone(paginator.previous_cursor)
+        second = self.client.get(
+            url, {'after': paginator.next_cursor}).context['page_obj']
+        self.assertEqual(len(second), self.POST_SECOND_PAGE)
+        self.assertIsNone(second.paginator.next_cursor)
+        back = self.client.get(
+            url, {'before': second.paginator.previous_cursor},
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        last = self.client.get(url, {'page': 'last'}).context['page_obj']
+        self.assertEqual(len(last), POST_LIMIT)
+        self.assertIsNone(last.paginator.next_cursor)
+
+    def test_index_reads_only_one_page(self):
+        """Главная читает одну страницу постов одним запросом.
+
+        Вариантов картинок у этих постов нет, запроса за ними тоже.
+        """
+        url = reverse('posts:index')
+        for _ in range(2):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(len(queries), 1)
+            self.assertIn(f'LIMIT {POST_LIMIT + 1}', queries[0]['sql'])
+            self.assertEqual(len(response.context['page_obj']), POST_LIMIT)
+            Post.objects.bulk_create(
+                Post(author=self.user, text=f'{num}Еще пост')
+                for num in range(POST_LIMIT * 3)
+            )
+
+    def test_numbered_pages_skip_count(self):
+        """Переход по номеру страницы берет число постов из счетчиков."""
+        Follow.objects.create(
+            user=User.objects.create_user(username='reader'),
+            author=self.user,
+        )
+        reader = Client()
+        reader.force_login(User.objects.get(username='reader'))
+        urls = {
+            reverse('posts:index'): self.client,
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}):
+            self.client,
+            reverse('posts:profile', kwargs={'username': self.user}):
+            self.client,
+            reverse('posts:follow_index'): reader,
+        }
+        self.client.get(reverse('posts:index'), {'page': 2})
+        for url, client in urls.items():
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url, {'page': 2})
+                self.assertFalse(
+                    any('COUNT(' in query['sql'] for query in queries))
+                page_obj = response.context['page_obj']
+                self.assertEqual(len(page_obj), self.POST_SECOND_PAGE)
+                self.assertFalse(page_obj.has_next())
+                self.assertTrue(page_obj.has_previous())
+
+    def test_page_out_of_range_opens_last_page(self):
+        response = self.client.get(reverse('posts:index'), {'page': 99})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), POST_LIMIT)
+        self.assertIsNone(page_obj.paginator.next_cursor)
+
+    def test_broken_cursor_opens_first_page(self):
+        response = self.client.get(reverse('posts:index'), {'after': '!!'})
+        self.assertEqual(len(response.context['page_obj']), POST_LIMIT)
+        self.assertIsNone(response.context['page_obj'].paginator
+                          .previous_cursor)
+
 
 class FollowTest(TestCase):
     @classmethod
@@ -271,6 +384,28 @@ class FollowTest(TestCase):
                     kwargs={'username': f'{self.authors.username}'}))
         self.assertEqual(Follow.objects.count(), follow_count - 1)
 
+    def test_follow_twice_keeps_one_row(self):
+        """Повторная подписка не создает дубль и стоит один INSERT."""
+        url = reverse('posts:profile_follow',
+                      kwargs={'username': self.authors.username})
+        self.user.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.user.get(url)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            Follow.objects.filter(user=self.users, author=self.authors)
+            .count(), 1)
+
+    def test_follow_constraints(self):
+        """База не дает создать дубль подписки и подписку на себя."""
+        Follow.objects.create(user=self.users, author=self.authors)
+        for author in (self.authors, self.users):
+            with self.subTest(author=author):
+                with self.assertRaises(IntegrityError):
+                    with transaction.atomic():
+                        Follow.objects.create(user=self.users, author=author)
+
     def test_folow_on_self(self):
         """Проверка подписки на себя."""
         follow_count = Follow.objects.count()
@@ -298,3 +433,360 @@ class FollowTest(TestCase):
                     kwargs={'username': f'{self.authors.username}'}))
         response = self.user.get(reverse('posts:follow_index'))
         self.assertEqual(len(response.context['page_obj']), 0)
+
+
+class FeedQueriesTest(TestCase):
+    """
+    Число запросов лент не зависит от числа карточек на странице.
+
+    Варианты картинок читаются отдельным запросом, только если на
+    странице есть посты с картинками.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'{num}Пост')
+            for num in range(POST_LIMIT + 3)
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        cache.clear()
+
+    def assertFeedQueries(self, client, url, num):
+        with self.assertNumQueries(num):
+            response = client.get(url)
+        self.assertEqual(len(response.context['page_obj']), POST_LIMIT)
+
+    def test_index_queries(self):
+        self.assertFeedQueries(self.client, reverse('posts:index'), 1)
+
+    def test_group_posts_queries(self):
+        url = reverse('posts:group_posts', kwargs={'slug': self.group.slug})
+        self.assertFeedQueries(self.client, url, 2)
+
+    def test_profile_queries(self):
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        self.assertFeedQueries(self.client, url, 2)
+
+    def test_follow_index_queries(self):
+        """Сессия, пользователь, неразложенные подписки и страница."""
+        url = reverse('posts:follow_index')
+        self.assertFeedQueries(self.reader_client, url, 4)
+
+
+class CommentsPageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f'{num}Коммент')
+            for num in range(COMMENT_LIMIT + 5)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_first_comments(self):
+        """Пост показывает одну порцию комментариев за один запрос."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENT_LIMIT)
+        self.assertIsNotNone(comments.paginator.next_cursor)
+
+    def test_load_more_comments(self):
+        """Фрагмент "Показать еще" отдает оставшиеся комментарии."""
+        first = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id},
+        )).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'after': first.paginator.next_cursor},
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        rest = response.context['comments']
+        self.assertEqual(len(rest), 5)
+        self.assertFalse(set(first) & set(rest))
+        self.assertNotContains(response, 'js-more-comments')
+
+
+class CachedLookupsTest(TestCase):
+    """Группа и автор читаются из кеша и сбрасываются сигналами."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.group_url = reverse('posts:group_posts', args=('test-slug',))
+        self.profile_url = reverse('posts:profile', args=('author',))
+
+    def test_warm_lookups_skip_database(self):
+        """Из базы читаются только посты страницы."""
+        for url in (self.group_url, self.profile_url):
+            with self.subTest(url=url):
+                self.client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+                self.assertEqual(len(queries), 1)
+                self.assertIn('FROM "posts_post"', queries[0]['sql'])
+
+    def test_cached_author_has_no_secrets(self):
+        self.client.get(self.profile_url)
+        author = cache.get(object_key('author', self.author.pk))
+        self.assertEqual(author, self.author)
+        self.assertLessEqual(
+            {'password', 'email'}, author.get_deferred_fields())
+        self.assertNotIn('password', author.__dict__)
+
+    def test_group_change_invalidates(self):
+        self.client.get(self.group_url)
+        self.group.title = 'Новое название'
+        self.group.save()
+        response = self.client.get(self.group_url)
+        self.assertEqual(response.context['group'].title, 'Новое название')
+
+    def test_counters_invalidate(self):
+        self.client.get(self.group_url)
+        self.client.get(self.profile_url)
+        Post.objects.create(author=self.author, group=self.group, text='Пост')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        group = self.client.get(self.group_url).context['group']
+        author = self.client.get(self.profile_url).context['author']
+        self.assertEqual(group.post_count, 1)
+        self.assertEqual(author.profile.post_count, 1)
+        self.assertEqual(author.profile.follower_count, 1)
+
+    def test_renamed_group_is_not_found_by_old_slug(self):
+        self.client.get(self.group_url)
+        Group.objects.filter(pk=self.group.pk).update(slug='other-slug')
+        cache.delete(f'group:{self.group.pk}')
+        self.assertEqual(self.client.get(self.group_url).status_code, 404)
+
+
+class PostCardsTest(TestCase):
+    """Карточки постов кешируются и собираются одним get_many."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.profile_url = reverse('posts:profile', args=('author',))
+        self.group_url = reverse('posts:group_posts', args=('test-slug',))
+
+    def rendered_cards(self, url):
+        with mock.patch(
+            'posts.templatetags.post_cards.render_to_string',
+            wraps=render_to_string,
+        ) as render:
+            response = self.client.get(url)
+        return render.call_count, response
+
+    def test_cards_rendered_once(self):
+        self.assertEqual(self.rendered_cards(self.profile_url)[0], 1)
+        count, response = self.rendered_cards(self.profile_url)
+        self.assertEqual(count, 0)
+        self.assertContains(response, 'Тестовый пост')
+
+    def test_edit_renders_new_card(self):
+        self.rendered_cards(self.profile_url)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        count, response = self.rendered_cards(self.profile_url)
+        self.assertEqual(count, 1)
+        self.assertContains(response, 'Новый текст')
+
+    def test_group_page_has_own_card(self):
+        """На странице группы карточка без ссылки на группу."""
+        self.rendered_cards(self.profile_url)
+        count, response = self.rendered_cards(self.group_url)
+        self.assertEqual(count, 1)
+        self.assertNotContains(response, 'все записи группы')
+
+    def test_author_rename_renders_new_card(self):
+        self.rendered_cards(self.group_url)
+        self.author.first_name = 'Имя'
+        self.author.save()
+        count, response = self.rendered_cards(self.group_url)
+        self.assertEqual(count, 1)
+        self.assertContains(response, 'Автор: Имя')
+
+    def test_placeholder_card_not_cached(self):
+        Post.objects.filter(pk=self.post.pk).update(image='posts/none.gif')
+        self.rendered_cards(self.profile_url)
+        self.assertEqual(self.rendered_cards(self.profile_url)[0], 1)
+
+
+@override_settings(FULL_PAGE_CACHE=True)
+class FullPageCacheTest(TestCase):
+    """Страницы кешируются целиком, пользовательские куски дорисовываются."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.detail_url = reverse('posts:post_detail', args=(self.post.id,))
+
+    def test_anonymous_hit_skips_database(self):
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:profile', args=('author',)),
+            self.detail_url,
+        ):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(second.content, first.content)
+                self.assertContains(second, 'Войти')
+
+    def test_users_share_cached_body(self):
+        """Автор получает страницу, закешированную гостем, со своим меню."""
+        self.client.get(self.detail_url)
+        response = self.author_client.get(self.detail_url)
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        self.assertContains(response, 'Пользователь: author')
+        self.assertContains(response, 'редактировать запись')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        response = self.client.get(self.detail_url)
+        self.assertNotContains(response, 'author</li>')
+        self.assertNotContains(response, 'редактировать запись')
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+
+    def test_follow_button_per_user(self):
+        url = reverse('posts:profile', args=('author',))
+        self.author_client.get(url)
+        self.assertContains(self.reader_client.get(url), 'Отписаться')
+        self.assertContains(self.client.get(url), 'Подписаться')
+        self.assertNotContains(self.author_client.get(url), 'Подписаться')
+
+    def test_varies_on_query_string(self):
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'{num}Пост')
+            for num in range(POST_LIMIT)
+        )
+        first = self.client.get(reverse('posts:index'))
+        second = self.client.get(reverse('posts:index'), {'page': 2})
+        self.assertNotEqual(first.content, second.content)
+
+    def test_comment_invalidates_page(self):
+        self.client.get(self.detail_url)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Новый комментарий')
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Новый комментарий')
+
+    def test_not_found_page_has_menu(self):
+        response = self.client.get(reverse('posts:profile', args=('nobody',)))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotContains(response, 'hole:', status_code=404)
+        self.assertContains(response, 'Войти', status_code=404)
+
+
+class ConditionalGetTest(TestCase):
+    """Неизмененные страницы отдаются как 304 без рендера."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.detail_url = reverse('posts:post_detail', args=(self.post.id,))
+
+    def test_not_modified_skips_view(self):
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:profile', args=('author',)),
+            self.detail_url,
+        ):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                self.assertIn('no-cache', first['Cache-Control'])
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=first['ETag'])
+                self.assertEqual(response.status_code, 304)
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_etag_differs_per_user(self):
+        guest = self.client.get(self.detail_url)
+        author = self.author_client.get(self.detail_url)
+        self.assertNotEqual(guest['ETag'], author['ETag'])
+        response = self.author_client.get(
+            self.detail_url, HTTP_IF_NONE_MATCH=guest['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_comment_changes_etag(self):
+        first = self.client.get(self.detail_url)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Новый комментарий')
+        response = self.client.get(
+            self.detail_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertContains(response, 'Новый комментарий')
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_author_rename_changes_etag(self):
+        first = self.client.get(reverse('posts:index'))
+        self.author.first_name = 'Имя'
+        self.author.save()
+        response = self.client.get(
+            reverse('posts:index'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertContains(response, 'Автор: Имя')
+
+    def test_login_keeps_etag(self):
+        first = self.client.get(self.detail_url)
+        self.author_client.force_login(self.author)
+        response = self.client.get(
+            self.detail_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,126 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings as django_settings
+from django.db import connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.images import ImageFile
+
+from . import variants
+from .constans import THUMBNAIL_GEOMETRY, THUMBNAIL_OPTIONS
+from .utils import bump_feed_version, bump_page_version
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+# Задачи, поставленные снова, пока прежняя еще в очереди или идет.
+_rerun = set()
+_pending_lock = threading.Lock()
+
+
+def ready_thumbnail(image):
+    """
+    Готовая миниатюра картинки поста или None.
+
+    Только смотрит в key-value хранилище sorl и никогда не
+    декодирует картинку в потоке запроса.
+    """
+    if not image:
+        return None
+    source = ImageFile(image)
+    options = _thumbnail_options(source)
+    name = default.backend._get_thumbnail_filename(
+        source, THUMBNAIL_GEOMETRY, options)
+    return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def _thumbnail_options(source):
+    """Опции миниатюры так же, как их дополняет get_thumbnail в sorl."""
+    options = dict(THUMBNAIL_OPTIONS)
+    backend = default.backend
+    if settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def schedule(name):
+    """Ставит генерацию миниатюры в фоновую очередь после коммита."""
+    transaction.on_commit(lambda: _submit(name, generate, name))
+
+
+def schedule_post(post):
+    """Миниатюра и варианты для srcset после смены картинки поста."""
+    if post.image:
+        schedule(post.image.name)
+    transaction.on_commit(
+        lambda: _submit(('variants', post.pk), variants.build, post.pk))
+
+
+def generate(name):
+    make(name)
+    # Заглушку в лентах и на страницах пора заменить картинкой.
+    bump_feed_version()
+    bump_page_version()
+
+
+def make(name):
+    return get_thumbnail(name, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS)
+
+
+def _submit(key, func, *args):
+    if not django_settings.IMAGE_WORKERS:
+        # Без фоновых потоков картинка обрабатывается сразу после коммита.
+        _call(key, func, *args)
+        return
+    with _pending_lock:
+        if key in _pending:
+            # Прежняя задача могла прочитать старую картинку.
+            _rerun.add(key)
+            return
+        _pending.add(key)
+    executor().submit(_run, key, func, *args)
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=django_settings.IMAGE_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def _run(key, func, *args):
+    """Выполняет задачу в фоновом потоке."""
+    try:
+        _call(key, func, *args)
+    finally:
+        with _pending_lock:
+            again = key in _rerun
+            _rerun.discard(key)
+            if not again:
+                _pending.discard(key)
+        connections.close_all()
+    if again:
+        executor().submit(_run, key, func, *args)
+
+
+def _call(key, func, *args):
+    """Ошибки обработки картинки только пишутся в лог."""
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Фоновая обработка картинки %s не удалась', key)
@@ -0,0 +1,133 @@
+from itertools import islice
+
+from django.core.cache import cache
+from django.db.models import F, Q
+
+from .constans import (
+    HEAVY_AUTHORS_KEY,
+    HEAVY_AUTHORS_TIMEOUT,
+    TIMELINE_BACKFILL_LIMIT,
+    TIMELINE_BATCH,
+    TIMELINE_ENABLED,
+    TIMELINE_FANOUT_LIMIT,
+)
+from .models import Follow, Post, Profile, TimelineEntry
+
+FOLLOW_FEED_KEYS = ('feed_date', 'feed_id')
+
+
+def heavy_authors():
+    """Авторы, чьи посты не раскладываются по лентам при записи.
+
+    У них слишком много подписчиков, их посты подмешиваются в ленту
+    при чтении (fan-out on read).
+    """
+    return cache.get_or_set(
+        HEAVY_AUTHORS_KEY, _count_heavy_authors, HEAVY_AUTHORS_TIMEOUT)
+
+
+def _count_heavy_authors():
+    return frozenset(
+        Profile.objects.filter(
+            follower_count__gte=TIMELINE_FANOUT_LIMIT,
+        ).values_list('user_id', flat=True)
+    )
+
+
+def fan_out(post):
+    """Кладет новый пост в ленты подписчиков автора.
+
+    Если автор популярный, пост в ленты не кладется, а подписки на
+    него помечаются как неразложенные: follow_feed() будет читать его
+    посты при запросе, даже когда автор перестанет быть популярным.
+    """
+    if not TIMELINE_ENABLED:
+        return
+    if post.author_id in heavy_authors():
+        Follow.objects.filter(
+            author_id=post.author_id, materialized=True,
+        ).update(materialized=False)
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id,
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def fan_in(follow):
+    """Заполняет ленту нового подписчика всеми постами автора.
+
+    На популярного или слишком плодовитого автора подписка сразу
+    остается неразложенной, чтобы не копировать его посты в запросе.
+    """
+    if not TIMELINE_ENABLED:
+        return
+    if (
+        follow.author_id in heavy_authors()
+        or _post_count(follow.author_id) > TIMELINE_BACKFILL_LIMIT
+    ):
+        Follow.objects.filter(pk=follow.pk).update(materialized=False)
+        return
+    posts = Post.objects.filter(
+        author_id=follow.author_id,
+    ).values_list('id', 'pub_date').iterator(chunk_size=TIMELINE_BATCH)
+    while True:
+        batch = list(islice(posts, TIMELINE_BATCH))
+        if not batch:
+            break
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(
+                    user_id=follow.user_id, post_id=post_id, pub_date=date)
+                for post_id, date in batch
+            ),
+            ignore_conflicts=True,
+        )
+
+
+def _post_count(author_id):
+    return Profile.objects.filter(
+        user_id=author_id,
+    ).values_list('post_count', flat=True).first() or 0
+
+
+def drop(follow):
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id,
+        post__author_id=follow.author_id,
+    ).delete()
+
+
+def follow_feed(user):
+    """Посты авторов, на которых подписан user, для ленты подписок.
+
+    Лента сортируется по ключам FOLLOW_FEED_KEYS: для материализованной
+    ленты это колонки TimelineEntry, и страница читается одним
+    проходом по индексу timeline_user_pub_date_idx. Посты авторов из
+    неразложенных подписок (см. fan_out) подмешиваются при чтении.
+    """
+    posts = Post.objects.for_feed()
+    if not TIMELINE_ENABLED:
+        posts = posts.filter(author__following__user=user)
+        return posts.annotate(feed_date=F('pub_date'), feed_id=F('id'))
+    unmaterialized = list(
+        Follow.objects.filter(user=user, materialized=False)
+        .values_list('author_id', flat=True)
+    )
+    if not unmaterialized:
+        return posts.filter(timeline_entries__user=user).annotate(
+            feed_date=F('timeline_entries__pub_date'),
+            feed_id=F('timeline_entries__post_id'),
+        )
+    posts = posts.filter(
+        Q(id__in=TimelineEntry.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=unmaterialized)
+    )
+    return posts.annotate(feed_date=F('pub_date'), feed_id=F('id'))
@@ -0,0 +1,122 @@
+from functools import wraps
+
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import (SkipFile,
+                                             TemporaryFileUploadHandler)
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageOps
+
+from .constans import (IMAGE_MAX_PIXELS, IMAGE_MAX_SIDE,
+                       IMAGE_UPLOAD_FORMATS, IMAGE_UPLOAD_MAX_SIZE)
+
+FORM_OVERHEAD = 64 * 1024  # запас на текстовые поля формы, байт
+
+
+class UploadRejected(Exception):
+    pass
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет картинку во временный файл по кускам и отбрасывает ее как можно
+    раньше: по Content-Length, по числу принятых байт и по заголовку.
+
+    Причины отказа копятся в request.upload_errors для формы.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.oversized = False
+        self.received = 0
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        self.oversized = (
+            content_length > IMAGE_UPLOAD_MAX_SIZE + FORM_OVERHEAD)
+
+    def new_file(self, *args, **kwargs):
+        if self.oversized:
+            self.reject(too_large())
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > IMAGE_UPLOAD_MAX_SIZE:
+            self.reject(too_large())
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        try:
+            return normalize(upload)
+        except UploadRejected as error:
+            upload.close()
+            self.request.upload_errors.append(str(error))
+            return None
+
+    def reject(self, message):
+        self.request.upload_errors.append(message)
+        raise SkipFile(message)
+
+
+def too_large():
+    return (
+        'Картинка больше '
+        f'{IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)} МБ.'
+    )
+
+
+def normalize(upload):
+    """
+    Проверяет заголовок картинки и при необходимости пересохраняет ее.
+
+    Image.open читает только заголовок. Пиксели декодируются, лишь если
+    нужно убрать EXIF или уменьшить оригинал; для JPEG draft() сразу
+    декодирует уменьшенную копию.
+    """
+    try:
+        image = Image.open(upload)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        raise UploadRejected('Файл не является картинкой.')
+    if image.format not in IMAGE_UPLOAD_FORMATS:
+        raise UploadRejected(f'Формат {image.format} не поддерживается.')
+    width, height = image.size
+    if width * height > IMAGE_MAX_PIXELS:
+        raise UploadRejected('Слишком большое разрешение картинки.')
+    if max(width, height) <= IMAGE_MAX_SIDE and not image.getexif():
+        upload.seek(0)
+        return upload
+    image_format = image.format
+    image.draft('RGB', (IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+    image = ImageOps.exif_transpose(image)
+    image.info.pop('exif', None)
+    image.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE), Image.LANCZOS)
+    result = TemporaryUploadedFile(
+        upload.name, upload.content_type, 0,
+        upload.charset, upload.content_type_extra,
+    )
+    image.save(result.file, image_format, quality=90)
+    result.size = result.file.tell()
+    result.file.seek(0)
+    upload.close()
+    return result
+
+
+def image_uploads(view):
+    """
+    Подключает ImageUploadHandler к представлению.
+
+    Обработчики загрузки меняются до чтения request.POST, а его читает
+    CsrfViewMiddleware, поэтому CSRF проверяется уже внутри.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_errors = []
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+
+    return wrapper
@@ -1,12 +1,143 @@
-from django.core.paginator import Paginator
+import time
+from datetime import datetime, timezone
+
 from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.shortcuts import get_object_or_404
+
+from core.cache import get_or_compute
+
+from .constans import (
+    COMMENT_LIMIT,
+    FEED_COUNT_TIMEOUT,
+    FEED_VERSION_KEY,
+    OBJECT_CACHE_TIMEOUT,
+    PAGE_MODIFIED_KEY,
+    PAGE_VERSION_KEY,
+    POST_LIMIT,
+)
+from .models import Post
+from .paginators import KeysetPaginator
 
-from .constans import POST_LIMIT
 
+def paginat(request, posts, keys=('pub_date', 'id'), count=None):
+    """Страница ленты по курсору из after/before.
 
-def paginat(request, posts):
-    cache.set("posts", posts, 20)
-    paginator = Paginator(posts, POST_LIMIT)
+    ?page=N по-прежнему работает через OFFSET для старых ссылок, число
+    постов для них берется из count (см. KeysetPaginator), ?page=last
+    открывает последнюю страницу без подсчета постов.
+    """
+    paginator = KeysetPaginator(posts, POST_LIMIT, keys=keys, count=count)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    if page_number == 'last':
+        return paginator.cursor_page(before='')
+    if page_number is not None:
+        return paginator.get_page(page_number)
+    return paginator.cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
+
+def comment_page(request, post):
+    """Порция комментариев поста после курсора из ?after=."""
+    comments = post.comments.select_related('author').only(
+        'id', 'text', 'created', 'post_id', 'author__username',
+    )
+    paginator = KeysetPaginator(
+        comments, COMMENT_LIMIT, keys=('created', 'id'))
+    return paginator.cursor_page(after=request.GET.get('after'))
+
+
+def feed_version():
+    """Текущая версия ленты, входит в ключи кеша её страниц.
+
+    Начальное значение берется от времени, чтобы после вытеснения
+    ключа из кеша версия не вернулась к уже использованной.
+    """
+    return _version(FEED_VERSION_KEY)
+
+
+def page_version():
+    """Версия страниц в кеше целиком, меняется и от комментариев и подписок."""
+    return _version(PAGE_VERSION_KEY)
+
+
+def _version(key):
+    return cache.get_or_set(key, _initial_version, None)
+
+
+def _initial_version():
+    return int(time.time() * 1000)
+
+
+def feed_count():
+    """Число всех постов, считается один раз на версию ленты."""
+    return get_or_compute(
+        f'feed_count:{feed_version()}',
+        Post.objects.count,
+        FEED_COUNT_TIMEOUT,
+    )
+
+
+def author_post_count(author):
+    """Число постов автора из профиля, None если профиля нет."""
+    try:
+        return author.profile.post_count
+    except ObjectDoesNotExist:
+        return None
+
+
+def bump_feed_version():
+    """Инвалидирует все закешированные страницы ленты разом."""
+    _bump(FEED_VERSION_KEY)
+
+
+def pages_modified():
+    """Время последнего изменения страниц, без запросов к базе.
+
+    Если ключ вытеснен из кеша, считаем, что страницы изменились сейчас.
+    """
+    return datetime.fromtimestamp(
+        cache.get_or_set(PAGE_MODIFIED_KEY, time.time, None),
+        tz=timezone.utc,
+    )
+
+
+def bump_page_version():
+    _bump(PAGE_VERSION_KEY)
+    cache.set(PAGE_MODIFIED_KEY, time.time(), None)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), None)
+
+
+def cached_object(prefix, queryset, field, value):
+    """Объект по уникальному полю из кеша, иначе из базы или 404.
+
+    Ключей два: значение поля -> pk и pk -> объект. Сигналы сбрасывают
+    объект по pk через forget(), значение поля проверяется при чтении,
+    так что переименование не вернет чужой объект.
+    """
+    pk = cache.get(f'{prefix}_pk:{value}')
+    obj = cache.get(object_key(prefix, pk)) if pk is not None else None
+    if obj is None or getattr(obj, field) != value:
+        obj = get_object_or_404(queryset, **{field: value})
+        cache.set_many({
+            f'{prefix}_pk:{value}': obj.pk,
+            object_key(prefix, obj.pk): obj,
+        }, OBJECT_CACHE_TIMEOUT)
+    return obj
+
+
+def object_key(prefix, pk):
+    return f'{prefix}:{pk}'
+
+
+def forget(prefix, *pks):
+    """Сбрасывает закешированные cached_object() объекты."""
+    cache.delete_many([object_key(prefix, pk) for pk in pks if pk])
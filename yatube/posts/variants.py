@@ -0,0 +1,97 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .constans import (IMAGE_VARIANT_FORMATS, IMAGE_VARIANT_QUALITY,
+                       IMAGE_VARIANT_WIDTHS, THUMBNAIL_GEOMETRY)
+from .models import ImageVariant, Post
+from .utils import bump_feed_version, bump_page_version
+
+Image.init()
+# AVIF и WebP пишутся, только если Pillow собран с их поддержкой.
+FORMATS = tuple(
+    fmt for fmt in IMAGE_VARIANT_FORMATS if fmt.upper() in Image.SAVE
+)
+WIDTH, HEIGHT = map(int, THUMBNAIL_GEOMETRY.split('x'))
+
+
+def widths(source_width):
+    """Ширины вариантов без бессмысленного увеличения картинки."""
+    fitting = [w for w in IMAGE_VARIANT_WIDTHS if w <= source_width]
+    return fitting or [IMAGE_VARIANT_WIDTHS[0]]
+
+
+def encode(image, fmt):
+    if fmt == 'jpeg' or image.mode not in ('RGB', 'RGBA'):
+        has_alpha = fmt != 'jpeg' and (
+            image.mode in ('RGBA', 'LA') or 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    buffer = BytesIO()
+    image.save(buffer, fmt, quality=IMAGE_VARIANT_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def build(post_id):
+    """
+    Пересобирает варианты картинки поста.
+
+    Кадрирование то же, что у миниатюры карточки, чтобы srcset
+    и src показывали одну картинку. Пост без картинки теряет варианты.
+    """
+    post = Post.objects.filter(pk=post_id).only('id', 'image').first()
+    if post is None:
+        return
+    variants = []
+    if post.image:
+        with post.image.open('rb') as file:
+            source = ImageOps.exif_transpose(Image.open(file))
+        stem = os.path.splitext(os.path.basename(post.image.name))[0]
+        for width in widths(source.width):
+            size = (width, round(width * HEIGHT / WIDTH))
+            resized = ImageOps.fit(source, size, Image.LANCZOS)
+            for fmt in FORMATS:
+                variant = ImageVariant(
+                    post=post,
+                    source=post.image.name,
+                    width=width,
+                    format=fmt,
+                )
+                variant.file.save(
+                    f'{stem}-{width}w.{fmt}',
+                    encode(resized, fmt),
+                    save=False,
+                )
+                variants.append(variant)
+    stale = list(post.variants.all())
+    with transaction.atomic():
+        # Запись идет первой: SQLite сразу берет блокировку на запись
+        # и ждет ее, а не падает при повышении блокировки чтения.
+        post.variants.all().delete()
+        current = Post.objects.filter(pk=post_id, image=post.image.name)
+        if current.exists():
+            ImageVariant.objects.bulk_create(variants)
+            # Новый updated_at сбрасывает закешированные карточки поста.
+            current.update(updated_at=timezone.now())
+            bump_feed_version()
+            bump_page_version()
+        else:
+            # Картинку успели сменить, варианты соберет следующая задача.
+            transaction.set_rollback(True)
+            stale = variants
+    for variant in stale:
+        variant.file.delete(save=False)
+
+
+def srcsets(post):
+    """Строки srcset по форматам из уже загруженных вариантов поста."""
+    sources = {}
+    for variant in post.variants.all():
+        if variant.source != post.image.name:
+            continue
+        sources.setdefault(variant.format, []).append(
+            f'{variant.file.url} {variant.width}w')
+    return {fmt: ', '.join(items) for fmt, items in sources.items()}
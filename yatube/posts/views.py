@@ -1,31 +1,52 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, render, redirect
-from django.core.cache import cache
 
+from core.page_cache import cache_page_with_holes
+
+from . import thumbnails
+from .conditions import conditional_page
+from .constans import PAGE_CACHE_TIMEOUT
 from .models import Post, Group, User, Follow
 from .forms import PostForm, CommentForm
-from .utils import paginat
-
-
+from .uploads import image_uploads
+from .timeline import FOLLOW_FEED_KEYS, follow_feed
+from .utils import (
+    author_post_count,
+    cached_object,
+    comment_page,
+    feed_count,
+    feed_version,
+    page_version,
+    paginat,
+)
+
+
+@conditional_page
+@cache_page_with_holes(PAGE_CACHE_TIMEOUT, page_version)
 def index(request):
-    """Шаблон главной страницы."""
-    cache.clear()
-    posts = cache.get("posts", None)
-    if posts is None:
-        posts = list(Post.objects.all())
-        page_obj = paginat(request, posts)
+    """Шаблон главной страницы.
+
+    Страница ленты кешируется в шаблоне по номеру страницы и версии
+    ленты, поэтому queryset остается ленивым: при попадании в кеш
+    посты из базы не читаются.
+    """
+    page_obj = paginat(
+        request, Post.objects.for_feed().feed_rows(), count=feed_count)
     context = {
         'page_obj': page_obj,
+        'feed_version': feed_version(),
     }
 
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page
+@cache_page_with_holes(PAGE_CACHE_TIMEOUT, page_version)
 def group_posts(request, slug):
     """Выводит шаблон группы постов."""
-    group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.select_related('group')
-    page_obj = paginat(request, posts)
+    group = cached_object('group', Group.objects.all(), 'slug', slug)
+    posts = group.posts.for_feed().feed_rows()
+    page_obj = paginat(request, posts, count=group.post_count)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -34,15 +55,28 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page
+@cache_page_with_holes(PAGE_CACHE_TIMEOUT, page_version)
 def profile(request, username):
     """Выводит шаблон профиля автора постов."""
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('author')
+    author = cached_object(
+        'author',
+        # В общий кеш попадает только то, что выводит страница, без
+        # хеша пароля и почты.
+        User.objects.select_related('profile').only(
+            'id', 'username', 'first_name', 'last_name',
+            'profile__id', 'profile__user_id', 'profile__post_count',
+            'profile__follower_count', 'profile__following_count',
+        ),
+        'username',
+        username,
+    )
+    posts = author.posts.for_feed().feed_rows()
     following = (
         request.user.is_authenticated
         and author.following.filter(user=request.user).exists()
     )
-    page_obj = paginat(request, posts)
+    page_obj = paginat(request, posts, count=author_post_count(author))
     context = {
         'author': author,
         'page_obj': page_obj,
@@ -52,34 +86,49 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@conditional_page
+@cache_page_with_holes(PAGE_CACHE_TIMEOUT, page_version)
 def post_detail(request, post_id):
     """Выводит шаблон поста."""
     post = get_object_or_404(Post.objects.select_related(
-        'author',
+        'author__profile',
         'group',
     ), id=post_id)
-    comments = post.comments.all()
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
         'form': form,
-        'comments': comments,
+        'comments': comment_page(request, post),
     }
 
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующая порция комментариев для кнопки "Показать еще"."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    context = {
+        'post': post,
+        'comments': comment_page(request, post),
+    }
+
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
+@image_uploads
 def post_create(request):
     """Выводит шаблон создания поста."""
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
+        upload_errors=request.upload_errors,
     )
     if form.is_valid() and request.method == "POST":
         post = form.save(commit=False)
         post.author = request.user
         form.save()
+        thumbnails.schedule_post(post)
 
         return redirect('posts:profile', username=post.author)
 
@@ -87,6 +136,7 @@ def post_create(request):
 
 
 @login_required
+@image_uploads
 def post_edit(request, post_id):
     """Выводит шаблон страницы редактирования поста."""
     post = get_object_or_404(Post, id=post_id)
@@ -98,9 +148,12 @@ def post_edit(request, post_id):
         request.POST or None,
         instance=post,
         files=request.FILES or None,
+        upload_errors=request.upload_errors,
     )
     if form.is_valid() and request.method == "POST":
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule_post(post)
 
         return redirect('posts:post_detail', post_id)
 
@@ -126,8 +179,8 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginat(request, posts)
+    posts = follow_feed(request.user).feed_rows()
+    page_obj = paginat(request, posts, keys=FOLLOW_FEED_KEYS)
     context = {
         'page_obj': page_obj,
     }
@@ -138,15 +191,9 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     """Подписка."""
-    following = get_object_or_404(User, username=username)
-    already_follows = Follow.objects.filter(
-        user=request.user,
-        author=following,
-    ).exists()
-    if request.user.username == username or already_follows:
-        return redirect('posts:profile', username=username)
-
-    Follow.objects.create(user=request.user, author=following)
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        Follow.objects.follow(request.user, author)
 
     return redirect('posts:profile', username=username)
 
@@ -154,7 +201,7 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     """Отписка."""
-    following = get_object_or_404(User, username=username)
-    Follow.objects.filter(author=following, user=request.user).delete()
+    author = get_object_or_404(User, username=username)
+    Follow.objects.unfollow(request.user, author)
 
     return redirect('posts:profile', username=username)
@@ -10,7 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -97,6 +101,10 @@ DATABASES = {
     }
 }
 
+# PRAGMA для каждого нового соединения с SQLite (core.db), их же
+# проверяет /health/. В разработке остаются значения SQLite по умолчанию.
+SQLITE_PRAGMAS = {}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -142,10 +150,52 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кеш страниц целиком (core.page_cache). В разработке выключен: страница
+# из кеша приходит без контекста шаблона.
+FULL_PAGE_CACHE = False
+
+# Потоков обработки картинок постов в процессе сервера.
+# 0 - миниатюры и варианты делаются сразу после коммита в самом запросе,
+# а недостающая миниатюра - при рендере страницы.
+IMAGE_WORKERS = 0
+
+# Прогрев шаблонов, URL и Pillow при запуске процесса (core.warmup).
+# В разработке выключен, шаблоны и так перечитываются с диска.
+WARM_UP = False
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+CACHE_LOCATION = os.environ.get(
+    'YATUBE_CACHE_LOCATION',
+    os.path.join(BASE_DIR, 'cache.sqlite3'),
+)
+
+# Тесты чистят кеш, поэтому у каждого прогона свой временный файл,
+# а кеш сервера разработки они не трогают.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    CACHE_LOCATION = os.path.join(
+        tempfile.mkdtemp(prefix='yatube-cache-'), 'cache.sqlite3')
+    atexit.register(shutil.rmtree, os.path.dirname(CACHE_LOCATION), True)
+
+# Файловый кеш общий для всех процессов сервера, в отличие от LocMemCache.
+# Перед ним маленький кеш процесса, изменения из других процессов
+# доходят до него не позже чем через POLL_INTERVAL секунд.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+            'POLL_INTERVAL': 1,
+            'L1_TIMEOUT': 5,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
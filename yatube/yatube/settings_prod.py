@@ -0,0 +1,67 @@
+"""
+Настройки боевого сервера поверх yatube.settings.
+
+Все, что отличается между установками, берется из переменных
+окружения YATUBE_*, обязательна только YATUBE_SECRET_KEY.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, TEMPLATES
+
+DEBUG = False
+
+try:
+    SECRET_KEY = os.environ['YATUBE_SECRET_KEY']
+except KeyError:
+    raise ImproperlyConfigured('Не задана переменная YATUBE_SECRET_KEY.')
+
+ALLOWED_HOSTS = os.environ.get('YATUBE_ALLOWED_HOSTS', 'localhost').split(',')
+
+# Соединение с базой живет между запросами потока, а не
+# открывается заново на каждый запрос.
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'NAME': os.environ.get(
+            'YATUBE_DB_PATH', os.path.join(BASE_DIR, 'db.sqlite3')),
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_CONN_MAX_AGE', 600)),
+    },
+}
+
+# WAL: читатели лент не ждут запись комментариев, писатели ждут
+# друг друга до busy_timeout мс, а не падают сразу с database is locked.
+# synchronous=NORMAL в WAL не теряет целостность, только последние
+# коммиты при отключении питания. cache_size < 0 - размер в КБ.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('YATUBE_SQLITE_BUSY_TIMEOUT', 5000)),
+    'mmap_size': int(os.environ.get('YATUBE_SQLITE_MMAP_SIZE', 256 << 20)),
+    'cache_size': -int(os.environ.get('YATUBE_SQLITE_CACHE_KB', 64 << 10)),
+}
+
+# Шаблоны читаются с диска и компилируются один раз на процесс.
+# С явными loaders APP_DIRS должен быть выключен.
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+WARM_UP = True
+
+FULL_PAGE_CACHE = True
+
+IMAGE_WORKERS = int(os.environ.get('YATUBE_IMAGE_WORKERS', 2))